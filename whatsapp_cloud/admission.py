@@ -0,0 +1,80 @@
+"""
+Admission control for inbound messages: token buckets per customer and per restaurant.
+Checked in the webhook before any DB or LLM work so one spammer can't burn the provider quota.
+"""
+import os
+import threading
+import time
+
+import metrics
+from ratelimit import TokenBucket
+
+# Rates are messages per minute; burst is how many can arrive back-to-back
+ADMIT_CUSTOMER_PER_MIN = float(os.getenv("ADMIT_CUSTOMER_PER_MIN", "12"))
+ADMIT_CUSTOMER_BURST = float(os.getenv("ADMIT_CUSTOMER_BURST", "6"))
+ADMIT_RESTAURANT_PER_MIN = float(os.getenv("ADMIT_RESTAURANT_PER_MIN", "600"))
+ADMIT_RESTAURANT_BURST = float(os.getenv("ADMIT_RESTAURANT_BURST", "100"))
+# "reply" = one canned reply per cooldown then drop; "drop" = always drop silently
+ADMIT_OVERLIMIT = os.getenv("ADMIT_OVERLIMIT", "reply").lower()
+ADMIT_REPLY_COOLDOWN = float(os.getenv("ADMIT_REPLY_COOLDOWN", "60"))
+ADMIT_OVERLIMIT_TEXT = os.getenv(
+    "ADMIT_OVERLIMIT_TEXT",
+    "Bhai thora saans lo, bohat saare messages aa gaye. Ek minute mein dobara likho, main yahin hoon.",
+)
+IDLE_BUCKET_SECONDS = 600
+
+ADMIT = "admit"
+REPLY = "reply"
+DROP = "drop"
+
+
+class Admission:
+    def __init__(self):
+        self.customers: dict[str, TokenBucket] = {}
+        self.restaurants: dict[int, TokenBucket] = {}
+        self.last_notice: dict[str, float] = {}
+        self.lock = threading.Lock()
+        self.last_prune = time.monotonic()
+
+    def _bucket(self, table: dict, key, per_min: float, burst: float) -> TokenBucket:
+        with self.lock:
+            bucket = table.get(key)
+            if bucket is None:
+                bucket = table[key] = TokenBucket(per_min / 60.0, burst)
+            return bucket
+
+    def _prune(self, now: float):
+        """Forget customers idle long enough that their bucket would be full again."""
+        with self.lock:
+            if now - self.last_prune < IDLE_BUCKET_SECONDS:
+                return
+            self.last_prune = now
+            for phone in [p for p, b in self.customers.items() if now - b.updated > IDLE_BUCKET_SECONDS]:
+                del self.customers[phone]
+                self.last_notice.pop(phone, None)
+
+    def check(self, customer_phone: str, restaurant_id: int) -> str:
+        """Return ADMIT, REPLY (send the canned over-limit text) or DROP, and count the outcome."""
+        now = time.monotonic()
+        self._prune(now)
+        customer = self._bucket(self.customers, customer_phone, ADMIT_CUSTOMER_PER_MIN, ADMIT_CUSTOMER_BURST)
+        if customer.take() > 0:
+            scope = "customer"
+        elif self._bucket(self.restaurants, restaurant_id, ADMIT_RESTAURANT_PER_MIN, ADMIT_RESTAURANT_BURST).take() > 0:
+            # Tenant-wide flood: don't let a rejected message cost this customer their own budget
+            customer.refund()
+            scope = "restaurant"
+        else:
+            metrics.inc("admission_total", outcome=ADMIT, scope="none")
+            return ADMIT
+        outcome = DROP
+        if ADMIT_OVERLIMIT == REPLY:
+            with self.lock:
+                if now - self.last_notice.get(customer_phone, -ADMIT_REPLY_COOLDOWN) >= ADMIT_REPLY_COOLDOWN:
+                    self.last_notice[customer_phone] = now
+                    outcome = REPLY
+        metrics.inc("admission_total", outcome=outcome, scope=scope)
+        return outcome
+
+
+admission = Admission()
@@ -0,0 +1,66 @@
+"""
+Hourly analytics rollups. Message/conversation counts are kept by DB triggers; the counters here
+(LLM calls, fast-path replies, delivered replies and their latency) are buffered in memory and
+flushed to stats_hourly every ROLLUP_FLUSH_SECONDS in one small transaction.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+
+import db
+
+log = logging.getLogger(__name__)
+
+ROLLUP_FLUSH_SECONDS = float(os.getenv("ROLLUP_FLUSH_SECONDS", "15"))
+
+
+def _hour(ts: float) -> str:
+    # UTC, same clock as SQLite datetime('now') used by the triggers
+    return time.strftime("%Y-%m-%d %H:00", time.gmtime(ts))
+
+
+class Rollup:
+    def __init__(self):
+        self.pending: dict[tuple[int, str], dict] = {}
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def record(self, restaurant_id: int | None, **counts):
+        """Add to this hour's counters, e.g. record(1, llm_calls=1, llm_ms_sum=850)."""
+        if restaurant_id is None:
+            return
+        key = (restaurant_id, _hour(time.time()))
+        with self.lock:
+            bucket = self.pending.setdefault(key, {})
+            for name, amount in counts.items():
+                bucket[name] = bucket.get(name, 0) + amount
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        try:
+            db.add_hourly_stats([(rid, hour, counts) for (rid, hour), counts in pending.items()])
+        except Exception as e:
+            log.exception("Rollup flush failed, keeping counters for next try: %s", e)
+            with self.lock:
+                for key, counts in pending.items():
+                    bucket = self.pending.setdefault(key, {})
+                    for name, amount in counts.items():
+                        bucket[name] = bucket.get(name, 0) + amount
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.thread = threading.Thread(target=self._run, name="rollup-flush", daemon=True)
+        self.thread.start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            time.sleep(ROLLUP_FLUSH_SECONDS)
+            self.flush()
+
+
+rollup = Rollup()
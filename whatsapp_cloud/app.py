@@ -6,16 +6,26 @@ import time
 import hmac
 import hashlib
 import logging
+from datetime import datetime, timezone
+from functools import wraps
 from pathlib import Path
 from dotenv import load_dotenv
-from flask import Flask, request
+from flask import Flask, jsonify, request
 
 # Load .env from phase folder
 load_dotenv(Path(__file__).resolve().parent.parent / ".env")
 
 import requests
 
+import admission
+import analytics
 import db
+import hours
+import menu_index
+import metrics
+import orders
+import sender
+import statuses
 
 app = Flask(__name__)
 logging.basicConfig(level=logging.INFO)
@@ -32,20 +42,27 @@ CLAUDE_MODEL = os.getenv("CLAUDE_MODEL", "claude-haiku-4-5-20250929")
 WHATSAPP_TOKEN = os.getenv("WHATSAPP_ACCESS_TOKEN")
 WHATSAPP_VERIFY_TOKEN = os.getenv("WHATSAPP_VERIFY_TOKEN", "my_verify_token_123")
 APP_SECRET = os.getenv("META_APP_SECRET", "")
+# Bearer token for /metrics and /stats*; unset = those routes are off (use report.py instead)
+STATS_TOKEN = os.getenv("STATS_TOKEN", "")
 DEFAULT_RESTAURANT_ID = 1
 GRAPH_API_VERSION = "v21.0"
 BOT_NO_EMOJI = os.getenv("BOT_NO_EMOJI", "1").lower() in ("1", "true", "yes")
 BOT_BRAND = os.getenv("BOT_BRAND", "ReplyFlow by MadeReal")
-BOT_HOURS = os.getenv("BOT_HOURS", "")
+BOT_HOURS = os.getenv("BOT_HOURS", "")  # default schedule when restaurants.hours is empty, see hours.py
 RESTAURANT_NAME = os.getenv("RESTAURANT_NAME", "Moon Kitchen")
+# Cart state is tracked in the orders table, so only a short chat window is needed in the prompt
+BOT_HISTORY_MESSAGES = int(os.getenv("BOT_HISTORY_MESSAGES", "10"))
 
 
-def _get_system_and_user_prompt(menu_text: str, history_text: str, new_message: str) -> tuple[str, str]:
+def _get_system_and_user_prompt(
+    menu_text: str, history_text: str, new_message: str, cart_text: str = "cart: empty", hours_text: str = "",
+    hours_enforced: bool = False,
+) -> tuple[str, str]:
     emoji_rule = " Do NOT use emojis. Plain text only." if BOT_NO_EMOJI else " You may use emojis occasionally (😊👍🍛) but don't spam."
-    hours_note = (
-        f" We're open {BOT_HOURS}. If they ask and it's outside these hours, say we're closed and when we open."
-        if BOT_HOURS else ""
-    )
+    hours_note = f" We're open {hours_text} (Karachi time)." if hours_text else ""
+    if hours_text and not hours_enforced:
+        # Free-text hours the webhook can't check (e.g. "12pm to 11pm"): leave it to the model
+        hours_note += " If they ask and it's outside these hours, say we're closed and when we open."
     system = f"""You are a friendly restaurant assistant for {RESTAURANT_NAME} in Karachi, Pakistan.
 
 PERSONALITY:
@@ -62,6 +79,7 @@ You take orders AND chat with customers. Both matter equally. You're a friendly
 
 MENU:
 The current menu (items and prices) is provided in the user message below. Use ONLY that menu. Do not make up items or prices.
+The customer's current cart (tracked by the system, already priced) is also given below. Use it for prices and totals, but if the customer's latest message says something different, go with the customer and read the order back to them to confirm.
 
 CONVERSATION PHILOSOPHY:
 1. ALWAYS respond to what the customer ACTUALLY said first
@@ -95,9 +113,11 @@ CRITICAL RULES:
 - Always mix Urdu naturally. Never say "I don't know" - give human responses.
 - RESPOND to their actual message first. BUILD rapport. USE humor. GUIDE gently, never push."""
 
-    user = f"""Current menu (use only these items and prices):
+    user = f"""Current menu (use only these items and prices; items not listed may still exist, don't invent prices for them):
 {menu_text}
 
+Current order: {cart_text}
+
 Chat so far:
 {history_text}
 
@@ -206,41 +226,28 @@ def _call_claude(system: str, user_content: str) -> str:
     return fallback_msg
 
 
+def build_prompt(conv_id: int, new_message: str, restaurant_id: int = DEFAULT_RESTAURANT_ID) -> tuple[str, str]:
+    """Assemble (system, user) for one turn from history, cart and relevant menu. No LLM call."""
+    history = db.get_conversation_history(conv_id, BOT_HISTORY_MESSAGES)
+    history_text = "\n".join(f"{h['role']}: {h['content']}" for h in history) or "(no previous messages)"
+    order = db.get_open_order(conv_id)
+    cart_text = orders.cart_summary(order)
+    cart_ids = [i["menu_item_id"] for i in order["items"]] if order else []
+    menu_text = menu_index.relevant_menu_text(restaurant_id, new_message, history, cart_ids)
+    hours_text = hours.hours_text(restaurant_id, BOT_HOURS)
+    enforced = hours.get_schedule(restaurant_id, BOT_HOURS) is not None
+    return _get_system_and_user_prompt(menu_text, history_text, new_message, cart_text, hours_text, enforced)
+
+
 def get_ai_reply(customer_phone: str, new_message: str, restaurant_id: int = DEFAULT_RESTAURANT_ID) -> tuple[str, int]:
     conv_id = db.get_or_create_conversation(restaurant_id, customer_phone)
-    menu_text = db.get_menu_text(restaurant_id)
-    history = db.get_conversation_history(conv_id)
-    history_text = "\n".join(f"{h['role']}: {h['content']}" for h in history) or "(no previous messages)"
-    system, user = _get_system_and_user_prompt(menu_text, history_text, new_message)
+    system, user = build_prompt(conv_id, new_message, restaurant_id)
+    t0 = time.monotonic()
     reply = _call_claude(system, user)
+    analytics.rollup.record(restaurant_id, llm_calls=1, llm_ms_sum=int((time.monotonic() - t0) * 1000))
     return reply or "Sorry, try again.", conv_id
 
 
-def send_whatsapp_message(phone_number_id: str, to: str, text: str) -> bool:
-    """Send reply via WhatsApp Cloud API."""
-    if not WHATSAPP_TOKEN:
-        log.warning("WHATSAPP_ACCESS_TOKEN not set")
-        return False
-    url = f"https://graph.facebook.com/{GRAPH_API_VERSION}/{phone_number_id}/messages"
-    headers = {"Authorization": f"Bearer {WHATSAPP_TOKEN}", "Content-Type": "application/json"}
-    body = {
-        "messaging_product": "whatsapp",
-        "recipient_type": "individual",
-        "to": to.lstrip("+"),
-        "type": "text",
-        "text": {"body": text},
-    }
-    try:
-        r = requests.post(url, json=body, headers=headers, timeout=10)
-        if r.status_code >= 400:
-            log.error("WhatsApp API %s: %s", r.status_code, r.text)
-        r.raise_for_status()
-        return True
-    except Exception as e:
-        log.exception("WhatsApp send failed: %s", e)
-        return False
-
-
 def verify_signature(payload: bytes, signature: str) -> bool:
     """Verify X-Hub-Signature-256 using app secret."""
     if not APP_SECRET or not signature:
@@ -250,7 +257,7 @@ def verify_signature(payload: bytes, signature: str) -> bool:
 
 
 def parse_webhook(data: dict) -> list[dict]:
-    """Extract messages from Cloud API. Each item: {from, text?, audio_id?, phone_number_id, mime_type?}."""
+    """Extract messages from Cloud API. Each item: {from, id, text?, audio_id?, phone_number_id, mime_type?}."""
     result = []
     for entry in data.get("entry", []):
         for change in entry.get("changes", []):
@@ -260,11 +267,14 @@ def parse_webhook(data: dict) -> list[dict]:
                 from_num = str(msg.get("from", ""))
                 if not from_num or not phone_number_id:
                     continue
+                msg_id = str(msg.get("id", ""))
                 msg_type = msg.get("type", "")
                 if msg_type == "text":
                     body = (msg.get("text", {}) or {}).get("body", "").strip()
                     if body:
-                        result.append({"from": from_num, "text": body, "phone_number_id": phone_number_id})
+                        result.append({
+                            "from": from_num, "id": msg_id, "text": body, "phone_number_id": phone_number_id,
+                        })
                 elif msg_type == "audio" or msg_type == "voice":
                     audio = msg.get("audio") or msg.get("voice") or {}
                     media_id = audio.get("id")
@@ -272,6 +282,7 @@ def parse_webhook(data: dict) -> list[dict]:
                     if media_id:
                         result.append({
                             "from": from_num,
+                            "id": msg_id,
                             "audio_id": str(media_id),
                             "phone_number_id": phone_number_id,
                             "mime_type": mime,
@@ -320,9 +331,9 @@ def webhook_verify():
 @app.route("/webhook", methods=["POST"])
 def webhook_receive():
     """Meta sends POST with incoming messages. Reply using Claude Haiku."""
+    accepted_at = time.time()
     raw = request.get_data()
     sig = request.headers.get("X-Hub-Signature-256", "")
-    log.info("Webhook POST received")
     if not verify_signature(raw, sig):
         log.warning("Invalid webhook signature")
         return "Bad signature", 403
@@ -333,6 +344,13 @@ def webhook_receive():
         log.warning("Webhook JSON parse failed: %s", e)
         data = {}
 
+    # Fast path: sent/delivered/read/failed callbacks outnumber messages – buffer and ack
+    if statuses.is_status_only(data):
+        statuses.status_buffer.add(statuses.parse_statuses(data))
+        return "", 200
+    statuses.status_buffer.add(statuses.parse_statuses(data))
+
+    log.info("Webhook POST received")
     messages = parse_webhook(data)
     log.info("Parsed %d message(s) from webhook", len(messages))
     if not messages:
@@ -341,26 +359,57 @@ def webhook_receive():
     for msg in messages:
         customer_phone = msg["from"]
         phone_number_id = msg["phone_number_id"]
+        verdict = admission.admission.check(customer_phone, DEFAULT_RESTAURANT_ID)
+        if verdict != admission.ADMIT:
+            log.warning("Over limit from %s: %s", customer_phone, verdict)
+            if verdict == admission.REPLY:
+                sender.queue_message(None, phone_number_id, customer_phone, admission.ADMIT_OVERLIMIT_TEXT)
+                analytics.rollup.record(DEFAULT_RESTAURANT_ID, fast_path=1)
+            continue
+        schedule = hours.get_schedule(DEFAULT_RESTAURANT_ID, BOT_HOURS)
+        now = datetime.fromtimestamp(accepted_at, timezone.utc)
+        if schedule and not schedule.is_open(now):
+            # Closed: templated reply, no LLM call – and no orders taken while closed
+            try:
+                reply = hours.closed_reply(schedule, now, RESTAURANT_NAME)
+                conv_id = db.get_or_create_conversation(DEFAULT_RESTAURANT_ID, customer_phone)
+                db.save_message(conv_id, "user", msg.get("text", "[voice message]"))
+                db.save_message(conv_id, "bot", reply)
+                sender.queue_message(conv_id, phone_number_id, customer_phone, reply, accepted_at)
+                metrics.inc("closed_reply_total")
+                analytics.rollup.record(DEFAULT_RESTAURANT_ID, fast_path=1)
+            except Exception as e:
+                log.exception("Closed reply failed for %s: %s", customer_phone, e)
+            continue
         try:
             if "text" in msg:
                 text = msg["text"]
                 log.info("Message from %s: %s", customer_phone, text[:50])
-                reply, conv_id = get_ai_reply(customer_phone, text)
+                with sender.typing_while(phone_number_id, msg.get("id"), accepted_at):
+                    reply, conv_id = get_ai_reply(customer_phone, text)
                 db.save_message(conv_id, "user", text)
                 db.save_message(conv_id, "bot", reply)
-                ok = send_whatsapp_message(phone_number_id, customer_phone, reply)
-                log.info("WhatsApp send: %s", "ok" if ok else "FAILED")
+                outbox_id = sender.queue_message(conv_id, phone_number_id, customer_phone, reply, accepted_at)
+                log.info("WhatsApp reply queued: outbox %s", outbox_id)
+                try:
+                    orders.update_after_turn(conv_id, DEFAULT_RESTAURANT_ID, text, reply)
+                except Exception as e:
+                    log.exception("Order update failed for %s: %s", customer_phone, e)
             elif "audio_id" in msg:
+                sender.signal_read(phone_number_id, msg.get("id"), accepted_at)
                 audio_bytes = download_media(msg["audio_id"])
                 if audio_bytes:
                     log.info("Voice from %s", customer_phone)
                     reply, conv_id = transcribe_and_reply(
                         customer_phone, audio_bytes, msg.get("mime_type", "audio/ogg")
                     )
+                    analytics.rollup.record(DEFAULT_RESTAURANT_ID, fast_path=1)
                     db.save_message(conv_id, "user", "[voice message]")
                     db.save_message(conv_id, "bot", reply)
-                    ok = send_whatsapp_message(phone_number_id, customer_phone, reply)
-                    log.info("WhatsApp send: %s", "ok" if ok else "FAILED")
+                    outbox_id = sender.queue_message(
+                        conv_id, phone_number_id, customer_phone, reply, accepted_at
+                    )
+                    log.info("WhatsApp reply queued: outbox %s", outbox_id)
                 else:
                     log.warning("Could not download voice from %s", customer_phone)
         except Exception as e:
@@ -369,6 +418,50 @@ def webhook_receive():
     return "", 200
 
 
+def require_stats_token(view):
+    """Reporting routes share the public webhook host: require Authorization: Bearer $STATS_TOKEN."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not STATS_TOKEN:
+            return "", 404
+        auth = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(auth.encode(), f"Bearer {STATS_TOKEN}".encode()):
+            return "", 401
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@app.route("/metrics", methods=["GET"])
+@require_stats_token
+def metrics_export():
+    """Prometheus-style counters (admission outcomes, etc.)."""
+    return metrics.render(), 200, {"Content-Type": "text/plain; version=0.0.4"}
+
+
+@app.route("/stats", methods=["GET"])
+@require_stats_token
+def stats_report():
+    """Read-only hourly rollups: /stats?restaurant_id=1&hours=24. Never scans messages."""
+    hours_back = min(request.args.get("hours", 24, type=int), 24 * 90)
+    restaurant_id = request.args.get("restaurant_id", type=int)
+    since = time.strftime("%Y-%m-%d %H:00", time.gmtime(time.time() - hours_back * 3600))
+    rows = db.get_hourly_stats(restaurant_id, since)
+    totals = {}
+    for r in rows:
+        for k, v in r.items():
+            if k not in ("restaurant_id", "hour"):
+                totals[k] = totals.get(k, 0) + v
+    return jsonify({"since": since, "totals": totals, "hourly": rows})
+
+
+@app.route("/stats/delivery", methods=["GET"])
+@require_stats_token
+def delivery_report():
+    """Delivery latency and failure rate per phone_number_id from status callbacks: /stats/delivery?hours=24."""
+    hours_back = min(request.args.get("hours", 24, type=int), 24 * 90)
+    return jsonify(db.get_delivery_stats(int(time.time()) - hours_back * 3600))
+
+
 if __name__ == "__main__":
     if not APIFREE_API_KEY and not ANTHROPIC_API_KEY:
         raise SystemExit("Set APIFREE_API_KEY (apifree.com) or ANTHROPIC_API_KEY in .env")
@@ -379,5 +472,8 @@ if __name__ == "__main__":
     if not WHATSAPP_TOKEN:
         log.warning("WHATSAPP_ACCESS_TOKEN not set – webhook will verify but won't send replies")
     db.init_db()
+    sender.outbox_sender.start()
+    analytics.rollup.start()
+    statuses.status_buffer.start()
     debug = os.getenv("FLASK_DEBUG", "0").lower() in ("1", "true", "yes")
     app.run(host="0.0.0.0", port=int(os.getenv("PORT", 5000)), debug=debug)
@@ -0,0 +1,171 @@
+"""
+Prompt token-footprint benchmark. Builds prompts through app.build_prompt for recorded
+(bench_corpus.json) and synthetic conversations across menu sizes, offline – no LLM calls.
+Run: python bench_prompt.py            (fails if input tokens grew past the baseline)
+     python bench_prompt.py --update   (write bench_baseline.json)
+
+Tokens are approximated locally (~4 chars per token per word, punctuation = 1),
+close enough to Claude's tokenizer to catch prompt-size regressions.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import db
+
+BASE_DIR = Path(__file__).resolve().parent
+CORPUS_FILE = BASE_DIR / "bench_corpus.json"
+BASELINE_FILE = BASE_DIR / "bench_baseline.json"
+MENU_SIZES = [18, 150, 600]
+SYNTHETIC_CONVERSATIONS = 5
+SYNTHETIC_TURNS = 14
+DEFAULT_TOLERANCE = 0.05
+# Settings that change prompt size, pinned so the baseline doesn't depend on the local .env
+BENCH_ENV = {
+    "BOT_HOURS": "",
+    "BOT_NO_EMOJI": "1",
+    "BOT_BRAND": "ReplyFlow by MadeReal",
+    "RESTAURANT_NAME": "Moon Kitchen",
+    "BOT_HISTORY_MESSAGES": "10",
+    "MENU_TOP_K": "12",
+    "MENU_FULL_MAX_ITEMS": "40",
+    "MENU_FALLBACK": "categories",
+}
+
+DISHES = ["Karahi", "Biryani", "Pulao", "Nihari", "Haleem", "Tikka", "Kebab", "Burger", "Shawarma", "Roll",
+          "Pizza", "Sandwich", "Fries", "Nuggets", "Wings", "Paratha", "Naan", "Lassi", "Shake", "Chai"]
+STYLES = ["Chicken", "Beef", "Mutton", "Special", "Cheese", "Spicy", "Malai", "Reshmi", "Peri Peri", "Zinger",
+          "Family", "Crispy", "Smoky", "Masala", "Achari"]
+CHATTER = ["bhai kya scene hai", "acha theek hai", "kitni der lagegi?", "yaar jaldi bhejna", "address clifton block 5",
+           "payment cod", "aur kuch special hai?", "nahi bas itna hi"]
+
+
+def approx_tokens(text: str) -> int:
+    return sum(max(1, math.ceil(len(w) / 4)) for w in re.findall(r"\w+|[^\w\s]", text))
+
+
+def synthetic_menu(size: int, rng: random.Random) -> list[dict]:
+    if size == len(db.DEFAULT_MENU):
+        return [{"name": n, "price_rs": p, "category": c, "aliases": a} for n, p, c, a in db.DEFAULT_MENU]
+    items, seen = [], set()
+    while len(items) < size:
+        dish = rng.choice(DISHES)
+        name = f"{rng.choice(STYLES)} {dish}"
+        if len(seen) >= len(DISHES) * len(STYLES):
+            name += f" {len(items)}"
+        if name in seen:
+            continue
+        seen.add(name)
+        items.append({"name": name, "price_rs": rng.randrange(50, 2500, 10), "category": dish, "aliases": ""})
+    return items
+
+
+def synthetic_conversations(menu: list[dict], rng: random.Random) -> list[dict]:
+    convs = []
+    for n in range(SYNTHETIC_CONVERSATIONS):
+        turns = []
+        for _ in range(SYNTHETIC_TURNS):
+            if rng.random() < 0.5:
+                item = rng.choice(menu)["name"].lower()
+                msg = f"{rng.randint(1, 3)} {item} chahiye"
+            else:
+                msg = rng.choice(CHATTER)
+            turns.append([msg, "Theek hai bhai, note kar liya. Aur kuch?"])
+        convs.append({"name": f"synthetic_{n}", "turns": turns})
+    return convs
+
+
+def run_conversation(app, restaurant_id: int, conv: dict, phone: str) -> dict:
+    """Replay a conversation turn by turn; returns token counts and build times per turn."""
+    conv_id = db.get_or_create_conversation(restaurant_id, phone)
+    tokens, build_ms = [], []
+    for user_msg, bot_reply in conv["turns"]:
+        t0 = time.perf_counter()
+        system, user = app.build_prompt(conv_id, user_msg, restaurant_id)
+        build_ms.append((time.perf_counter() - t0) * 1000)
+        tokens.append(approx_tokens(system) + approx_tokens(user))
+        db.save_message(conv_id, "user", user_msg)
+        db.save_message(conv_id, "bot", bot_reply)
+        app.orders.update_after_turn(conv_id, restaurant_id, user_msg, bot_reply)
+    return {"tokens": tokens, "build_ms": build_ms}
+
+
+def run_benchmark() -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_FILE = Path(tmp) / "bench.db"
+        return _run()
+
+
+def _run() -> dict:
+    db.init_db()
+    # load_dotenv in app doesn't override variables that are already set
+    os.environ.update(BENCH_ENV)
+    import app  # after DB_FILE is redirected and settings are pinned
+
+    rng = random.Random(42)
+    recorded = json.loads(CORPUS_FILE.read_text(encoding="utf-8"))
+    results = {}
+    tracemalloc.start()
+    for restaurant_id, size in enumerate(MENU_SIZES, start=10):
+        menu = synthetic_menu(size, rng)
+        db.import_menu(restaurant_id, menu, f"Bench {size}")
+        for conv in recorded + synthetic_conversations(menu, rng):
+            key = f"{conv['name']}@{size}"
+            tracemalloc.reset_peak()
+            out = run_conversation(app, restaurant_id, conv, f"bench-{key}")
+            results[key] = {
+                "avg_tokens": round(statistics.mean(out["tokens"]), 1),
+                "max_tokens": max(out["tokens"]),
+                "median_build_ms": round(statistics.median(out["build_ms"]), 3),
+                "peak_kb": round(tracemalloc.get_traced_memory()[1] / 1024, 1),
+            }
+    tracemalloc.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt token-footprint benchmark.")
+    parser.add_argument("--update", action="store_true", help="write results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed growth in tokens vs baseline (default 0.05 = 5%%)")
+    args = parser.parse_args()
+
+    results = run_benchmark()
+    print(f"{'case':34} {'avg_tok':>8} {'max_tok':>8} {'build_ms':>9} {'peak_kb':>8}")
+    for key, r in results.items():
+        print(f"{key:34} {r['avg_tokens']:>8} {r['max_tokens']:>8} {r['median_build_ms']:>9} {r['peak_kb']:>8}")
+
+    if args.update:
+        baseline = {k: {"avg_tokens": r["avg_tokens"], "max_tokens": r["max_tokens"]} for k, r in results.items()}
+        BASELINE_FILE.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        print(f"Baseline written to {BASELINE_FILE.name}")
+        return
+    if not BASELINE_FILE.exists():
+        raise SystemExit(f"No {BASELINE_FILE.name} yet – run with --update first")
+    baseline = json.loads(BASELINE_FILE.read_text(encoding="utf-8"))
+    failures = []
+    for key, base in baseline.items():
+        r = results.get(key)
+        if r is None:
+            failures.append(f"{key}: missing from this run")
+            continue
+        for field in ("avg_tokens", "max_tokens"):
+            if r[field] > base[field] * (1 + args.tolerance):
+                failures.append(f"{key}: {field} {base[field]} -> {r[field]}")
+    if failures:
+        print("Prompt size regression:\n  " + "\n  ".join(failures))
+        raise SystemExit(1)
+    print(f"OK: {len(baseline)} cases within {args.tolerance:.0%} of baseline")
+
+
+if __name__ == "__main__":
+    main()
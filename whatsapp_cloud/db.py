@@ -1,13 +1,31 @@
 """
 Database layer for WhatsApp Cloud API bot (SQLite).
 """
+import hashlib
+import json
 import sqlite3
+import time
 from pathlib import Path
 from contextlib import contextmanager
 
 BASE_DIR = Path(__file__).resolve().parent
 DB_FILE = BASE_DIR / "bot.db"
 
+# Built-in menu for restaurant 1: (name, price_rs, category, aliases)
+DEFAULT_MENU = [
+    ("Zinger Burger", 350, "Burgers", "zinger"), ("Beef Burger", 320, "Burgers", ""),
+    ("Chicken Burger", 280, "Burgers", ""),
+    ("Chicken Shawarma", 250, "Shawarma & Rolls", "shwarma"),
+    ("Beef Shawarma", 280, "Shawarma & Rolls", "shwarma"),
+    ("Chicken Roll", 200, "Shawarma & Rolls", ""), ("Beef Roll", 220, "Shawarma & Rolls", ""),
+    ("Paratha Roll", 180, "Shawarma & Rolls", "parotha"),
+    ("French Fries", 120, "Sides", "chips"), ("Cheese Fries", 150, "Sides", "loaded fries"),
+    ("Chicken Tikka", 400, "BBQ", "tikka boti"), ("Seekh Kebab (6 pcs)", 350, "BBQ", "seekh kabab"),
+    ("Chicken Nuggets (6 pcs)", 180, "Sides", ""),
+    ("Pepsi", 80, "Drinks", "cold drink"), ("Coke", 80, "Drinks", "coca cola, cold drink"),
+    ("Water", 50, "Drinks", "pani"), ("Lassi", 120, "Drinks", ""), ("Chai", 60, "Drinks", "tea"),
+]
+
 
 @contextmanager
 def get_conn():
@@ -25,13 +43,19 @@ def init_db():
         conn.executescript("""
             CREATE TABLE IF NOT EXISTS restaurants (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL
+                name TEXT NOT NULL,
+                menu_version INTEGER NOT NULL DEFAULT 0,
+                seed_hash TEXT,
+                hours TEXT,
+                holidays TEXT
             );
             CREATE TABLE IF NOT EXISTS menu_items (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 restaurant_id INTEGER NOT NULL,
                 name TEXT NOT NULL,
                 price_rs INTEGER NOT NULL,
+                category TEXT,
+                aliases TEXT,
                 FOREIGN KEY (restaurant_id) REFERENCES restaurants(id)
             );
             CREATE TABLE IF NOT EXISTS conversations (
@@ -49,24 +73,222 @@ def init_db():
                 created_at TEXT DEFAULT (datetime('now')),
                 FOREIGN KEY (conversation_id) REFERENCES conversations(id)
             );
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                conversation_id INTEGER,
+                phone_number_id TEXT NOT NULL,
+                to_phone TEXT NOT NULL,
+                body TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                accepted_at REAL,
+                enqueued_at REAL NOT NULL,
+                next_attempt_at REAL NOT NULL,
+                sent_at REAL,
+                latency_ms INTEGER,
+                wa_message_id TEXT,
+                last_error TEXT,
+                created_at TEXT DEFAULT (datetime('now')),
+                FOREIGN KEY (conversation_id) REFERENCES conversations(id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox(status, next_attempt_at);
+            CREATE TABLE IF NOT EXISTS orders (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                conversation_id INTEGER NOT NULL,
+                restaurant_id INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'open',
+                total_rs INTEGER NOT NULL DEFAULT 0,
+                created_at TEXT DEFAULT (datetime('now')),
+                updated_at TEXT DEFAULT (datetime('now')),
+                FOREIGN KEY (conversation_id) REFERENCES conversations(id),
+                FOREIGN KEY (restaurant_id) REFERENCES restaurants(id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_orders_conv ON orders(conversation_id, status);
+            CREATE TABLE IF NOT EXISTS order_items (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                order_id INTEGER NOT NULL,
+                menu_item_id INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                qty INTEGER NOT NULL,
+                unit_price_rs INTEGER NOT NULL,
+                UNIQUE(order_id, menu_item_id),
+                FOREIGN KEY (order_id) REFERENCES orders(id),
+                FOREIGN KEY (menu_item_id) REFERENCES menu_items(id)
+            );
+            CREATE TABLE IF NOT EXISTS stats_hourly (
+                restaurant_id INTEGER NOT NULL,
+                hour TEXT NOT NULL,
+                messages_in INTEGER NOT NULL DEFAULT 0,
+                messages_out INTEGER NOT NULL DEFAULT 0,
+                new_conversations INTEGER NOT NULL DEFAULT 0,
+                llm_calls INTEGER NOT NULL DEFAULT 0,
+                llm_ms_sum INTEGER NOT NULL DEFAULT 0,
+                fast_path INTEGER NOT NULL DEFAULT 0,
+                cache_hits INTEGER NOT NULL DEFAULT 0,
+                replies_sent INTEGER NOT NULL DEFAULT 0,
+                reply_ms_sum INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (restaurant_id, hour)
+            );
+            CREATE TABLE IF NOT EXISTS message_statuses (
+                wa_message_id TEXT PRIMARY KEY,
+                phone_number_id TEXT NOT NULL,
+                recipient TEXT,
+                status TEXT NOT NULL,
+                sent_ts INTEGER,
+                delivered_ts INTEGER,
+                read_ts INTEGER,
+                failed_ts INTEGER,
+                error_code INTEGER,
+                error_title TEXT,
+                updated_at TEXT DEFAULT (datetime('now'))
+            );
+            -- Row-derived counters are kept by triggers so they can't drift from the raw tables
+            CREATE TRIGGER IF NOT EXISTS trg_stats_new_conversation AFTER INSERT ON conversations
+            BEGIN
+                INSERT INTO stats_hourly (restaurant_id, hour, new_conversations)
+                VALUES (NEW.restaurant_id, strftime('%Y-%m-%d %H:00', 'now'), 1)
+                ON CONFLICT(restaurant_id, hour) DO UPDATE SET new_conversations = new_conversations + 1;
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_stats_message AFTER INSERT ON messages
+            BEGIN
+                INSERT INTO stats_hourly (restaurant_id, hour, messages_in, messages_out)
+                VALUES (
+                    COALESCE((SELECT restaurant_id FROM conversations WHERE id = NEW.conversation_id), 0),
+                    strftime('%Y-%m-%d %H:00', 'now'), NEW.role = 'user', NEW.role != 'user'
+                )
+                ON CONFLICT(restaurant_id, hour) DO UPDATE SET
+                    messages_in = messages_in + excluded.messages_in,
+                    messages_out = messages_out + excluded.messages_out;
+            END;
         """)
-        # Ensure restaurant 1 exists and always use Pakistani Fast Food menu (fixes old menu on redeploy)
+        # Columns added after first release – old bot.db files need them too
+        _ensure_column(conn, "restaurants", "menu_version", "INTEGER NOT NULL DEFAULT 0")
+        _ensure_column(conn, "menu_items", "category", "TEXT")
+        _ensure_column(conn, "menu_items", "aliases", "TEXT")
+        _ensure_column(conn, "restaurants", "seed_hash", "TEXT")
+        _ensure_column(conn, "outbox", "accepted_at", "REAL")
+        _ensure_column(conn, "restaurants", "hours", "TEXT")
+        _ensure_column(conn, "restaurants", "holidays", "TEXT")
+        # Ensure restaurant 1 exists with the built-in Pakistani Fast Food menu. A changed DEFAULT_MENU is
+        # only re-applied while the menu is still exactly the last seed (or empty): once a CSV/JSON import
+        # or manual edit has changed it, restaurant 1's menu is left alone.
         conn.execute("INSERT OR IGNORE INTO restaurants (id, name) VALUES (1, 'Pakistani Fast Food')")
-        conn.execute("UPDATE restaurants SET name = 'Pakistani Fast Food' WHERE id = 1")
-        conn.execute("DELETE FROM menu_items WHERE restaurant_id = 1")
-        pakistani_menu = [
-            ("Zinger Burger", 350), ("Beef Burger", 320), ("Chicken Burger", 280),
-            ("Chicken Shawarma", 250), ("Beef Shawarma", 280), ("Chicken Roll", 200),
-            ("Beef Roll", 220), ("Paratha Roll", 180), ("French Fries", 120),
-            ("Cheese Fries", 150), ("Chicken Tikka", 400), ("Seekh Kebab (6 pcs)", 350),
-            ("Chicken Nuggets (6 pcs)", 180), ("Pepsi", 80), ("Coke", 80), ("Water", 50),
-            ("Lassi", 120), ("Chai", 60),
+        seed = [
+            {"name": n, "price_rs": p, "category": c, "aliases": a} for n, p, c, a in DEFAULT_MENU
         ]
-        for name, price in pakistani_menu:
-            conn.execute(
-                "INSERT INTO menu_items (restaurant_id, name, price_rs) VALUES (1, ?, ?)",
-                (name, price),
-            )
+        seed_hash = menu_hash(seed)
+        row = conn.execute("SELECT seed_hash FROM restaurants WHERE id = 1").fetchone()
+        if row["seed_hash"] != seed_hash:
+            current = [
+                dict(r) for r in conn.execute(
+                    "SELECT name, price_rs, category, aliases FROM menu_items WHERE restaurant_id = 1"
+                )
+            ]
+            if not current or menu_hash(current) == row["seed_hash"]:
+                conn.execute(
+                    "UPDATE restaurants SET name = 'Pakistani Fast Food', seed_hash = ? WHERE id = 1", (seed_hash,)
+                )
+                _apply_menu(conn, 1, seed)
+
+
+def _ensure_column(conn, table: str, column: str, decl: str):
+    cols = {r["name"] for r in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in cols:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+def bump_menu_version(conn, restaurant_id: int):
+    """Call inside the transaction that changed menu_items so cached menu indexes get rebuilt."""
+    conn.execute("UPDATE restaurants SET menu_version = menu_version + 1 WHERE id = ?", (restaurant_id,))
+
+
+def _normalize_menu_item(item: dict) -> dict:
+    return {
+        "name": str(item["name"]).strip(),
+        "price_rs": int(item["price_rs"]),
+        "category": (item.get("category") or "").strip() or None,
+        "aliases": (item.get("aliases") or "").strip() or None,
+    }
+
+
+def menu_hash(items: list[dict]) -> str:
+    norm = sorted((_normalize_menu_item(i) for i in items), key=lambda i: i["name"].lower())
+    return hashlib.sha256(json.dumps(norm, sort_keys=True).encode()).hexdigest()
+
+
+def _apply_menu(conn, restaurant_id: int, items: list[dict], delete_missing: bool = True) -> dict:
+    """Diff items against menu_items (matched by name, case-insensitive) and write only the changes."""
+    incoming = {}
+    for item in items:
+        item = _normalize_menu_item(item)
+        if item["name"]:
+            incoming[item["name"].lower()] = item
+    existing = {
+        r["name"].lower(): dict(r)
+        for r in conn.execute(
+            "SELECT id, name, price_rs, category, aliases FROM menu_items WHERE restaurant_id = ?",
+            (restaurant_id,),
+        )
+    }
+    inserts, updates = [], []
+    for key, item in incoming.items():
+        old = existing.get(key)
+        if old is None:
+            inserts.append((restaurant_id, item["name"], item["price_rs"], item["category"], item["aliases"]))
+        elif any(old[f] != item[f] for f in ("name", "price_rs", "category", "aliases")):
+            updates.append((item["name"], item["price_rs"], item["category"], item["aliases"], old["id"]))
+    deletes = [(r["id"],) for key, r in existing.items() if key not in incoming] if delete_missing else []
+    if inserts:
+        conn.executemany(
+            "INSERT INTO menu_items (restaurant_id, name, price_rs, category, aliases) VALUES (?, ?, ?, ?, ?)",
+            inserts,
+        )
+    if updates:
+        conn.executemany(
+            "UPDATE menu_items SET name = ?, price_rs = ?, category = ?, aliases = ? WHERE id = ?", updates
+        )
+    if deletes:
+        conn.executemany("DELETE FROM menu_items WHERE id = ?", deletes)
+    if inserts or updates or deletes:
+        bump_menu_version(conn, restaurant_id)
+    return {
+        "inserted": len(inserts),
+        "updated": len(updates),
+        "deleted": len(deletes),
+        "unchanged": len(incoming) - len(inserts) - len(updates),
+    }
+
+
+def import_menu(restaurant_id: int, items: list[dict], restaurant_name: str | None = None,
+                delete_missing: bool = True) -> dict:
+    """Bulk upsert a restaurant's menu in one transaction. Returns counts of inserted/updated/deleted/unchanged."""
+    with get_conn() as conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO restaurants (id, name) VALUES (?, ?)",
+            (restaurant_id, restaurant_name or f"Restaurant {restaurant_id}"),
+        )
+        if restaurant_name:
+            conn.execute("UPDATE restaurants SET name = ? WHERE id = ?", (restaurant_name, restaurant_id))
+        return _apply_menu(conn, restaurant_id, items, delete_missing)
+
+
+def get_restaurant_hours(restaurant_id: int) -> tuple[str | None, str | None]:
+    with get_conn() as conn:
+        row = conn.execute("SELECT hours, holidays FROM restaurants WHERE id = ?", (restaurant_id,)).fetchone()
+    return (row["hours"], row["holidays"]) if row else (None, None)
+
+
+def set_restaurant_hours(restaurant_id: int, hours: str | None, holidays: str | None = None):
+    with get_conn() as conn:
+        conn.execute(
+            "UPDATE restaurants SET hours = ?, holidays = ? WHERE id = ?", (hours, holidays, restaurant_id)
+        )
+
+
+def get_menu_version(restaurant_id: int) -> int:
+    with get_conn() as conn:
+        row = conn.execute("SELECT menu_version FROM restaurants WHERE id = ?", (restaurant_id,)).fetchone()
+    return row["menu_version"] if row else 0
 
 
 def get_or_create_conversation(restaurant_id: int, customer_phone: str) -> int:
@@ -103,13 +325,266 @@ def get_conversation_history(conversation_id: int, last_n: int = 20) -> list[dic
     return [{"role": r["role"], "content": r["content"]} for r in reversed(rows)]
 
 
-def get_menu_text(restaurant_id: int) -> str:
+def get_menu_items(restaurant_id: int) -> list[dict]:
     with get_conn() as conn:
         cur = conn.execute(
-            "SELECT name, price_rs FROM menu_items WHERE restaurant_id = ? ORDER BY name",
+            "SELECT id, name, price_rs, category, aliases FROM menu_items WHERE restaurant_id = ? ORDER BY name",
             (restaurant_id,),
         )
-        rows = cur.fetchall()
+        return [dict(r) for r in cur.fetchall()]
+
+
+# --- Outbound send queue (outbox). Status: pending -> sending -> sent | failed ---
+
+def enqueue_outbound(conversation_id: int | None, phone_number_id: str, to_phone: str, body: str,
+                     accepted_at: float | None = None) -> int:
+    now = time.time()
+    with get_conn() as conn:
+        cur = conn.execute(
+            """INSERT INTO outbox (conversation_id, phone_number_id, to_phone, body, accepted_at,
+                                   enqueued_at, next_attempt_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            (conversation_id, phone_number_id, to_phone, body, accepted_at, now, now),
+        )
+        return cur.lastrowid
+
+
+def claim_due_outbound(limit: int = 20) -> list[dict]:
+    """Mark up to `limit` due pending rows as 'sending' and return them (oldest first)."""
+    now = time.time()
+    with get_conn() as conn:
+        cur = conn.execute(
+            """SELECT o.id, o.conversation_id, c.restaurant_id, o.phone_number_id, o.to_phone, o.body,
+                      o.attempts, o.accepted_at, o.enqueued_at
+               FROM outbox o LEFT JOIN conversations c ON c.id = o.conversation_id
+               WHERE o.status = 'pending' AND o.next_attempt_at <= ?
+               ORDER BY o.next_attempt_at, o.id LIMIT ?""",
+            (now, limit),
+        )
+        rows = [dict(r) for r in cur.fetchall()]
+        claimed = []
+        for r in rows:
+            upd = conn.execute(
+                "UPDATE outbox SET status = 'sending' WHERE id = ? AND status = 'pending'",
+                (r["id"],),
+            )
+            if upd.rowcount:
+                claimed.append(r)
+    return claimed
+
+
+def mark_outbound_sent(outbox_id: int, wa_message_id: str | None, latency_ms: int):
+    with get_conn() as conn:
+        conn.execute(
+            """UPDATE outbox SET status = 'sent', attempts = attempts + 1, sent_at = ?,
+               latency_ms = ?, wa_message_id = ?, last_error = NULL WHERE id = ?""",
+            (time.time(), latency_ms, wa_message_id, outbox_id),
+        )
+
+
+def reschedule_outbound(outbox_id: int, delay_s: float, error: str | None = None, count_attempt: bool = True):
+    """Put a claimed row back to pending. count_attempt=False when only deferred for pacing."""
+    with get_conn() as conn:
+        conn.execute(
+            """UPDATE outbox SET status = 'pending', next_attempt_at = ?,
+               attempts = attempts + ?, last_error = COALESCE(?, last_error) WHERE id = ?""",
+            (time.time() + delay_s, 1 if count_attempt else 0, error, outbox_id),
+        )
+
+
+def mark_outbound_failed(outbox_id: int, error: str):
+    with get_conn() as conn:
+        conn.execute(
+            "UPDATE outbox SET status = 'failed', attempts = attempts + 1, last_error = ? WHERE id = ?",
+            (error[:500], outbox_id),
+        )
+
+
+def requeue_stuck_outbound():
+    """On startup: rows left in 'sending' by a crashed worker go back to pending."""
+    with get_conn() as conn:
+        conn.execute("UPDATE outbox SET status = 'pending' WHERE status = 'sending'")
+
+
+# --- Orders: one open order per conversation, items priced from menu_items ---
+
+def get_open_order(conversation_id: int) -> dict | None:
+    with get_conn() as conn:
+        row = conn.execute(
+            "SELECT id, status, total_rs FROM orders WHERE conversation_id = ? AND status = 'open' "
+            "ORDER BY id DESC LIMIT 1",
+            (conversation_id,),
+        ).fetchone()
+        if not row:
+            return None
+        items = conn.execute(
+            "SELECT menu_item_id, name, qty, unit_price_rs FROM order_items WHERE order_id = ? ORDER BY id",
+            (row["id"],),
+        ).fetchall()
+    return {**dict(row), "items": [dict(i) for i in items]}
+
+
+def set_order_items(conversation_id: int, restaurant_id: int, items: dict[int, int]) -> int:
+    """Replace the open order's items with {menu_item_id: qty}. Prices come from menu_items, unknown ids are dropped."""
+    with get_conn() as conn:
+        row = conn.execute(
+            "SELECT id FROM orders WHERE conversation_id = ? AND status = 'open' ORDER BY id DESC LIMIT 1",
+            (conversation_id,),
+        ).fetchone()
+        if row:
+            order_id = row["id"]
+        else:
+            order_id = conn.execute(
+                "INSERT INTO orders (conversation_id, restaurant_id) VALUES (?, ?)",
+                (conversation_id, restaurant_id),
+            ).lastrowid
+        conn.execute("DELETE FROM order_items WHERE order_id = ?", (order_id,))
+        conn.executemany(
+            """INSERT INTO order_items (order_id, menu_item_id, name, qty, unit_price_rs)
+               SELECT ?, id, name, ?, price_rs FROM menu_items WHERE id = ? AND restaurant_id = ?""",
+            [(order_id, qty, item_id, restaurant_id) for item_id, qty in items.items() if qty > 0],
+        )
+        conn.execute(
+            """UPDATE orders SET updated_at = datetime('now'),
+               total_rs = (SELECT COALESCE(SUM(qty * unit_price_rs), 0) FROM order_items WHERE order_id = ?)
+               WHERE id = ?""",
+            (order_id, order_id),
+        )
+    return order_id
+
+
+def set_order_status(order_id: int, status: str):
+    with get_conn() as conn:
+        conn.execute(
+            "UPDATE orders SET status = ?, updated_at = datetime('now') WHERE id = ?",
+            (status, order_id),
+        )
+
+
+def list_orders(restaurant_id: int, status: str | None = None, limit: int = 50) -> list[dict]:
+    """Order feed for the shop, newest first."""
+    sql = """SELECT o.id, o.status, o.total_rs, o.created_at, o.updated_at, c.customer_phone
+             FROM orders o JOIN conversations c ON c.id = o.conversation_id
+             WHERE o.restaurant_id = ?"""
+    params: list = [restaurant_id]
+    if status:
+        sql += " AND o.status = ?"
+        params.append(status)
+    sql += " ORDER BY o.id DESC LIMIT ?"
+    params.append(limit)
+    with get_conn() as conn:
+        orders = [dict(r) for r in conn.execute(sql, params).fetchall()]
+        for o in orders:
+            o["items"] = [dict(i) for i in conn.execute(
+                "SELECT name, qty, unit_price_rs FROM order_items WHERE order_id = ? ORDER BY id", (o["id"],)
+            ).fetchall()]
+    return orders
+
+
+# --- Hourly rollups (stats_hourly). Reports read only from here, never from messages/conversations ---
+
+STATS_COUNTERS = ("llm_calls", "llm_ms_sum", "fast_path", "cache_hits", "replies_sent", "reply_ms_sum")
+
+
+def add_hourly_stats(rows: list[tuple[int, str, dict]]):
+    """Add buffered counters: [(restaurant_id, hour, {counter: amount})], one transaction."""
     if not rows:
-        return "No menu items yet."
-    return "\n".join(f"- {r['name']}: Rs.{r['price_rs']}" for r in rows)
+        return
+    cols = ", ".join(STATS_COUNTERS)
+    marks = ", ".join("?" for _ in STATS_COUNTERS)
+    updates = ", ".join(f"{c} = {c} + excluded.{c}" for c in STATS_COUNTERS)
+    with get_conn() as conn:
+        conn.executemany(
+            f"""INSERT INTO stats_hourly (restaurant_id, hour, {cols}) VALUES (?, ?, {marks})
+                ON CONFLICT(restaurant_id, hour) DO UPDATE SET {updates}""",
+            [(rid, hour, *(int(counts.get(c, 0)) for c in STATS_COUNTERS)) for rid, hour, counts in rows],
+        )
+
+
+def get_hourly_stats(restaurant_id: int | None = None, since_hour: str = "") -> list[dict]:
+    sql = "SELECT * FROM stats_hourly WHERE hour >= ?"
+    params: list = [since_hour]
+    if restaurant_id is not None:
+        sql += " AND restaurant_id = ?"
+        params.append(restaurant_id)
+    sql += " ORDER BY restaurant_id, hour"
+    with get_conn() as conn:
+        return [dict(r) for r in conn.execute(sql, params).fetchall()]
+
+
+def backfill_hourly_stats():
+    """One-off: rebuild trigger-maintained counters from raw history (for data older than the triggers)."""
+    with get_conn() as conn:
+        conn.execute("UPDATE stats_hourly SET messages_in = 0, messages_out = 0, new_conversations = 0")
+        conn.execute(
+            """INSERT INTO stats_hourly (restaurant_id, hour, new_conversations)
+               SELECT restaurant_id, strftime('%Y-%m-%d %H:00', created_at), COUNT(*) FROM conversations
+               GROUP BY 1, 2 HAVING 1
+               ON CONFLICT(restaurant_id, hour) DO UPDATE SET new_conversations = excluded.new_conversations"""
+        )
+        conn.execute(
+            """INSERT INTO stats_hourly (restaurant_id, hour, messages_in, messages_out)
+               SELECT c.restaurant_id, strftime('%Y-%m-%d %H:00', m.created_at),
+                      SUM(m.role = 'user'), SUM(m.role != 'user')
+               FROM messages m JOIN conversations c ON c.id = m.conversation_id
+               GROUP BY 1, 2 HAVING 1
+               ON CONFLICT(restaurant_id, hour) DO UPDATE SET
+                   messages_in = excluded.messages_in, messages_out = excluded.messages_out"""
+        )
+
+
+# --- Outbound delivery statuses from Cloud API callbacks (one row per wa_message_id) ---
+
+def upsert_message_statuses(rows: list[dict]):
+    """Merge status rows; each timestamp keeps its earliest value, status becomes the furthest reached."""
+    with get_conn() as conn:
+        conn.executemany(
+            """INSERT INTO message_statuses (wa_message_id, phone_number_id, recipient, status,
+                   sent_ts, delivered_ts, read_ts, failed_ts, error_code, error_title)
+               VALUES (:wa_message_id, :phone_number_id, :recipient, 'sent',
+                   :sent_ts, :delivered_ts, :read_ts, :failed_ts, :error_code, :error_title)
+               ON CONFLICT(wa_message_id) DO UPDATE SET
+                   sent_ts = COALESCE(MIN(sent_ts, excluded.sent_ts), sent_ts, excluded.sent_ts),
+                   delivered_ts = COALESCE(MIN(delivered_ts, excluded.delivered_ts), delivered_ts, excluded.delivered_ts),
+                   read_ts = COALESCE(MIN(read_ts, excluded.read_ts), read_ts, excluded.read_ts),
+                   failed_ts = COALESCE(failed_ts, excluded.failed_ts),
+                   error_code = COALESCE(excluded.error_code, error_code),
+                   error_title = COALESCE(excluded.error_title, error_title),
+                   updated_at = datetime('now')""",
+            rows,
+        )
+        conn.executemany(
+            """UPDATE message_statuses SET status = CASE
+                   WHEN failed_ts IS NOT NULL THEN 'failed'
+                   WHEN read_ts IS NOT NULL THEN 'read'
+                   WHEN delivered_ts IS NOT NULL THEN 'delivered'
+                   ELSE 'sent' END
+               WHERE wa_message_id = ?""",
+            [(r["wa_message_id"],) for r in rows],
+        )
+
+
+def get_delivery_stats(since_ts: int) -> list[dict]:
+    """Per phone_number_id: messages, delivered, read, failed, failure rate and avg sent->delivered seconds."""
+    with get_conn() as conn:
+        rows = conn.execute(
+            """SELECT phone_number_id,
+                      COUNT(*) AS messages,
+                      SUM(delivered_ts IS NOT NULL) AS delivered,
+                      SUM(read_ts IS NOT NULL) AS read,
+                      SUM(status = 'failed') AS failed,
+                      AVG(CASE WHEN delivered_ts IS NOT NULL AND sent_ts IS NOT NULL
+                               THEN delivered_ts - sent_ts END) AS avg_delivery_s
+               FROM message_statuses
+               WHERE COALESCE(sent_ts, delivered_ts, read_ts, failed_ts) >= ?
+               GROUP BY phone_number_id ORDER BY phone_number_id""",
+            (since_ts,),
+        ).fetchall()
+    out = []
+    for r in rows:
+        r = dict(r)
+        r["failure_rate"] = round(r["failed"] / r["messages"], 4) if r["messages"] else 0.0
+        if r["avg_delivery_s"] is not None:
+            r["avg_delivery_s"] = round(r["avg_delivery_s"], 2)
+        out.append(r)
+    return out
@@ -0,0 +1,185 @@
+"""
+Opening hours in Asia/Karachi time. Parsed once per restaurant, checked in the webhook so
+out-of-hours messages get a templated reply without an LLM call.
+
+Hours format (";"-separated rules, later rules override earlier ones for the same day):
+    "12pm-11pm"                              every day
+    "mon-thu 12:00-23:00; fri 14:00-01:00"   day ranges, overnight allowed
+    "sat,sun 12pm-2am; tue closed"           also "daily 12pm-11pm", "noon-midnight"
+Holidays format: "2026-03-31 closed; 2026-12-25 16:00-23:00"
+"""
+import logging
+import re
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+
+import db
+
+log = logging.getLogger(__name__)
+
+try:
+    from zoneinfo import ZoneInfo
+    KARACHI = ZoneInfo("Asia/Karachi")
+except Exception:  # no tz database (e.g. Windows without tzdata) – Pakistan has no DST
+    KARACHI = timezone(timedelta(hours=5), "PKT")
+
+DAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+DAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+CACHE_SECONDS = 60
+
+
+def _parse_time(text: str) -> int:
+    """'12pm', '11:30pm', '23:00', '0030', 'noon', 'midnight' -> minutes after midnight."""
+    word = text.strip().lower()
+    if word in ("noon", "midday"):
+        return 12 * 60
+    if word == "midnight":
+        return 0
+    m = re.fullmatch(r"(\d{1,2})(?::?(\d{2}))?\s*(am|pm)?", text.strip().lower())
+    if not m:
+        raise ValueError(f"bad time: {text!r}")
+    hour, minute, ampm = int(m.group(1)), int(m.group(2) or 0), m.group(3)
+    if ampm:
+        if not 1 <= hour <= 12:
+            raise ValueError(f"bad time: {text!r}")
+        hour = hour % 12 + (12 if ampm == "pm" else 0)
+    if hour > 24 or minute > 59:
+        raise ValueError(f"bad time: {text!r}")
+    return hour * 60 + minute
+
+
+def _parse_ranges(text: str) -> list[tuple[int, int]]:
+    """'12pm-3pm, 6pm-1am' -> [(720, 900), (1080, 1500)]. End past midnight spills into the next day."""
+    if text.strip().lower() == "closed":
+        return []
+    ranges = []
+    for part in text.split(","):
+        start_s, sep, end_s = part.partition("-")
+        if not sep:
+            raise ValueError(f"bad range: {part!r}")
+        start, end = _parse_time(start_s), _parse_time(end_s)
+        if end <= start:
+            end += 24 * 60
+        ranges.append((start, end))
+    return ranges
+
+
+def _parse_days(text: str) -> list[int]:
+    days = []
+    for part in text.lower().split(","):
+        first, _, last = part.strip().partition("-")
+        if first[:3] not in DAYS or (last and last.strip()[:3] not in DAYS):
+            raise ValueError(f"bad day: {part!r}")
+        a = DAYS.index(first[:3])
+        b = DAYS.index(last.strip()[:3]) if last else a
+        days.extend((a + i) % 7 for i in range((b - a) % 7 + 1))
+    return days
+
+
+class Schedule:
+    def __init__(self, weekly: dict[int, list], holidays: dict[date, list], text: str):
+        self.weekly = weekly
+        self.holidays = holidays
+        self.text = text
+
+    def _ranges_for(self, day: date) -> list[tuple[int, int]]:
+        if day in self.holidays:
+            return self.holidays[day]
+        return self.weekly.get(day.weekday(), [])
+
+    def is_open(self, now: datetime) -> bool:
+        now = now.astimezone(KARACHI)
+        minute = now.hour * 60 + now.minute
+        today = now.date()
+        if any(s <= minute < e for s, e in self._ranges_for(today)):
+            return True
+        # Yesterday's overnight range, e.g. 14:00-01:00 still open at 00:30
+        yesterday = today - timedelta(days=1)
+        return any(s <= minute + 24 * 60 < e for s, e in self._ranges_for(yesterday))
+
+    def next_opening(self, now: datetime) -> datetime | None:
+        now = now.astimezone(KARACHI)
+        for offset in range(15):
+            day = now.date() + timedelta(days=offset)
+            for start, _ in sorted(self._ranges_for(day)):
+                opening = datetime(day.year, day.month, day.day, tzinfo=KARACHI) + timedelta(minutes=start)
+                if opening > now:
+                    return opening
+        return None
+
+
+@lru_cache(maxsize=64)
+def parse_schedule(hours_text: str, holidays_text: str = "") -> Schedule:
+    """Parse hours/holiday strings (see module docstring). Raises ValueError on bad input."""
+    weekly: dict[int, list] = {}
+    for rule in filter(None, (r.strip() for r in hours_text.split(";"))):
+        if rule.lower() == "closed":
+            raise ValueError("'closed' needs days, e.g. 'tue closed' (use holidays for dates)")
+        m = re.match(r"([a-z,\- ]+?)\s+(closed|(?:\d|noon|midday|midnight).*)$", rule.lower())
+        if m and m.group(1).strip() in ("daily", "everyday", "all"):
+            days, ranges = list(range(7)), _parse_ranges(m.group(2))
+        elif m:
+            days, ranges = _parse_days(m.group(1)), _parse_ranges(m.group(2))
+        else:
+            days, ranges = list(range(7)), _parse_ranges(rule)
+        for d in days:
+            weekly[d] = ranges
+    holidays: dict[date, list] = {}
+    for rule in filter(None, (r.strip() for r in holidays_text.split(";"))):
+        day_s, _, ranges_s = rule.partition(" ")
+        holidays[date.fromisoformat(day_s)] = _parse_ranges(ranges_s or "closed")
+    if not any(weekly.values()):
+        raise ValueError("no opening hours")
+    return Schedule(weekly, holidays, hours_text)
+
+
+_cache: dict[tuple[int, str], tuple[float, Schedule | None, str]] = {}
+_warned: set[tuple[int, str]] = set()
+_lock = threading.Lock()
+
+
+def _load(restaurant_id: int, default_hours: str) -> tuple[Schedule | None, str]:
+    key = (restaurant_id, default_hours)
+    with _lock:
+        cached = _cache.get(key)
+        if cached and time.monotonic() - cached[0] < CACHE_SECONDS:
+            return cached[1], cached[2]
+    hours_text, holidays_text = db.get_restaurant_hours(restaurant_id)
+    hours_text = hours_text or default_hours
+    schedule = None
+    if hours_text:
+        try:
+            schedule = parse_schedule(hours_text, holidays_text or "")
+        except ValueError as e:
+            if (restaurant_id, hours_text) not in _warned:
+                _warned.add((restaurant_id, hours_text))
+                log.warning("Restaurant %s hours not parseable (%s) – not enforcing: %r", restaurant_id, e, hours_text)
+    with _lock:
+        _cache[key] = (time.monotonic(), schedule, hours_text or "")
+    return schedule, hours_text or ""
+
+
+def get_schedule(restaurant_id: int, default_hours: str = "") -> Schedule | None:
+    """Schedule from restaurants.hours/holidays (falls back to default_hours). None = no enforcement."""
+    return _load(restaurant_id, default_hours)[0]
+
+
+def hours_text(restaurant_id: int, default_hours: str = "") -> str:
+    """The restaurant's configured hours as written (for the prompt), even if they didn't parse."""
+    return _load(restaurant_id, default_hours)[1]
+
+
+def closed_reply(schedule: Schedule, now: datetime, restaurant_name: str) -> str:
+    opening = schedule.next_opening(now)
+    if opening is None:
+        return f"Maaf kijiye bhai, {restaurant_name} abhi band hai. Jaise hi khulega hum bata denge."
+    now = now.astimezone(KARACHI)
+    days = (opening.date() - now.date()).days
+    when = "aaj" if days == 0 else "kal" if days == 1 else DAY_NAMES[opening.weekday()]
+    at = opening.strftime("%I:%M %p").lstrip("0")
+    return (
+        f"Maaf kijiye bhai, {restaurant_name} abhi band hai. "
+        f"Hum {when} {at} baje khulenge, tab order kar lena. Shukriya!"
+    )
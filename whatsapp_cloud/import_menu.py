@@ -0,0 +1,97 @@
+"""
+Bulk menu import for one restaurant from CSV or JSON. Only changed rows are written.
+Run: python import_menu.py menu.csv --restaurant 2 --name "Moon Kitchen"
+
+CSV columns: name, price_rs (or price), category, aliases
+Items missing from the file are deleted (unless --keep-missing). Unreadable files and missing
+required columns are always refused; a well-formed file with no items needs --allow-empty.
+JSON: a list of {"name", "price_rs", "category", "aliases"} or
+      {"restaurant_name": ..., "hours": ..., "holidays": ..., "items": [...]}
+Opening hours: --hours "mon-thu 12pm-11pm; fri-sun 2pm-1am" --holidays "2026-03-31 closed" (see hours.py)
+"""
+import argparse
+import csv
+import json
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import db
+import hours
+
+
+def load_items(path: Path) -> tuple[list[dict], dict]:
+    """Read menu rows from a .csv or .json file. Returns (items, restaurant fields from a JSON object)."""
+    if path.suffix.lower() == ".json":
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if isinstance(data, dict):
+            return data.get("items", []), {k: data.get(k) for k in ("restaurant_name", "hours", "holidays")}
+        return data, {}
+    with path.open(newline="", encoding="utf-8-sig") as f:
+        items = []
+        reader = csv.DictReader(f)
+        columns = {(c or "").strip().lower() for c in reader.fieldnames or []}
+        missing = [c for c in ("name", "price_rs") if c not in columns and not (c == "price_rs" and "price" in columns)]
+        if missing:
+            raise ValueError(f"missing column(s) {', '.join(missing)}; found {', '.join(sorted(columns)) or 'none'}")
+        for row in reader:
+            row = {(k or "").strip().lower(): (v or "").strip() for k, v in row.items()}
+            if not row.get("name"):
+                continue
+            items.append({
+                "name": row["name"],
+                "price_rs": row.get("price_rs") or row.get("price"),
+                "category": row.get("category"),
+                "aliases": row.get("aliases"),
+            })
+        return items, {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import a restaurant menu (diff-based upsert).")
+    parser.add_argument("file", type=Path, help="menu .csv or .json")
+    parser.add_argument("--restaurant", type=int, default=1, help="restaurant id (default 1)")
+    parser.add_argument("--name", help="restaurant name (created if the id is new)")
+    parser.add_argument("--keep-missing", action="store_true",
+                        help="don't delete existing items that are missing from the file")
+    parser.add_argument("--allow-empty", action="store_true",
+                        help="allow a well-formed file with no items (deletes the whole menu unless --keep-missing)")
+    parser.add_argument("--hours", help='opening hours in Karachi time, e.g. "daily 12pm-11pm"')
+    parser.add_argument("--holidays", help='overrides, e.g. "2026-03-31 closed; 2026-12-25 4pm-11pm"')
+    args = parser.parse_args()
+
+    try:
+        items, extra = load_items(args.file)
+    except (OSError, ValueError) as e:
+        raise SystemExit(f"Refusing to import {args.file}: {e}")
+    if not isinstance(items, list):
+        raise SystemExit(f"Refusing to import {args.file}: items must be a list")
+    hours_text = args.hours or extra.get("hours")
+    holidays_text = args.holidays or extra.get("holidays")
+    if hours_text:
+        try:
+            hours.parse_schedule(hours_text, holidays_text or "")
+        except ValueError as e:
+            raise SystemExit(f"Bad opening hours: {e}")
+    for n, item in enumerate(items, start=1):
+        if not isinstance(item, dict) or not str(item.get("name") or "").strip():
+            raise SystemExit(f"Item {n} in {args.file} has no name: {item}")
+        try:
+            item["price_rs"] = int(item["price_rs"])
+        except (KeyError, TypeError, ValueError):
+            raise SystemExit(f"Bad or missing price in {args.file}: {item}")
+    if not items and not args.allow_empty:
+        raise SystemExit(
+            f"No menu items in {args.file}; refusing to delete restaurant {args.restaurant}'s menu "
+            "(use --allow-empty to really clear it)"
+        )
+    db.init_db()
+    counts = db.import_menu(
+        args.restaurant, items, args.name or extra.get("restaurant_name"), delete_missing=not args.keep_missing
+    )
+    if hours_text:
+        db.set_restaurant_hours(args.restaurant, hours_text, holidays_text)
+    print(f"Restaurant {args.restaurant}: {counts}")
+
+
+if __name__ == "__main__":
+    main()
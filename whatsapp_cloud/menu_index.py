@@ -0,0 +1,160 @@
+"""
+Per-restaurant menu search index. Puts only the items relevant to the current chat into the prompt.
+Words are matched on character trigrams so Roman Urdu spellings ("zingr", "shawrma") still hit.
+"""
+import math
+import os
+import re
+import threading
+
+import db
+
+MENU_TOP_K = int(os.getenv("MENU_TOP_K", "12"))
+# Menus this small go into the prompt whole – retrieval only pays off for big menus
+MENU_FULL_MAX_ITEMS = int(os.getenv("MENU_FULL_MAX_ITEMS", "40"))
+# When nothing in the chat matches a big menu: "categories" = category headers (+ cart items),
+# "full" = whole menu (opt-in; costs the full menu on every greeting/address/small-talk turn)
+MENU_FALLBACK = os.getenv("MENU_FALLBACK", "categories").lower()
+MIN_WORD_SIMILARITY = 0.45
+# Drop weak matches scoring under this fraction of the best one
+RELATIVE_SCORE_CUTOFF = 0.3
+STOPWORDS = {
+    "hai", "hain", "bhai", "yaar", "yar", "kya", "aur", "nahi", "chahiye", "chaiye", "order", "please",
+    "the", "and", "with", "for", "karo", "karna", "kar", "dena", "de", "do", "mujhe", "hum", "ham", "bhi",
+}
+FULL_MENU_WORDS = {"menu", "list", "items"}
+
+
+def _words(text: str) -> list[str]:
+    return [w for w in re.findall(r"[a-z]+", text.lower()) if len(w) >= 3 and w not in STOPWORDS]
+
+
+def _grams(word: str) -> frozenset:
+    padded = f" {word} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _similarity(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+class MenuIndex:
+    """Trigram index for one restaurant. refresh() reuses entries for rows that didn't change."""
+
+    def __init__(self, restaurant_id: int):
+        self.restaurant_id = restaurant_id
+        self.version = None
+        self.items: dict[int, dict] = {}
+        self.entries: dict[int, tuple] = {}  # id -> (signature, [(word, grams, weight)])
+        self.idf: dict[str, float] = {}
+        self.categories: list[str] = []
+
+    def refresh(self, version: int):
+        rows = db.get_menu_items(self.restaurant_id)
+        entries = {}
+        for r in rows:
+            sig = (r["name"], r["aliases"], r["category"], r["price_rs"])
+            old = self.entries.get(r["id"])
+            if old and old[0] == sig:
+                entries[r["id"]] = old
+                continue
+            # Category words count half so "shawarma" ranks shawarmas above the rolls sharing their header
+            words = {w: 0.5 for w in _words(r["category"] or "")}
+            words.update({w: 1.0 for w in _words(r["name"] + " " + (r["aliases"] or "").replace(",", " "))})
+            entries[r["id"]] = (sig, [(w, _grams(w), wt) for w, wt in sorted(words.items())])
+        self.entries = entries
+        self.items = {r["id"]: r for r in rows}
+        doc_freq: dict[str, int] = {}
+        for _, words in entries.values():
+            for w, _, _ in words:
+                doc_freq[w] = doc_freq.get(w, 0) + 1
+        n = max(len(entries), 1)
+        self.idf = {w: math.log(1 + n / df) for w, df in doc_freq.items()}
+        self.categories = sorted({r["category"] or "Other" for r in rows})
+        self.version = version
+
+    def search(self, query_weights: dict[str, float], k: int) -> list[int]:
+        """Top-k item ids for weighted query words."""
+        query = [(_grams(w), wt) for w, wt in query_weights.items()]
+        scores = []
+        for item_id, (_, words) in self.entries.items():
+            score = 0.0
+            for q_grams, wt in query:
+                best = 0.0
+                for w, grams, w_wt in words:
+                    sim = _similarity(q_grams, grams)
+                    if sim >= MIN_WORD_SIMILARITY:
+                        best = max(best, sim * w_wt * self.idf.get(w, 1.0))
+                score += wt * best
+            if score > 0:
+                scores.append((score, item_id))
+        scores.sort(key=lambda s: (-s[0], s[1]))
+        cutoff = scores[0][0] * RELATIVE_SCORE_CUTOFF if scores else 0
+        return [item_id for score, item_id in scores[:k] if score >= cutoff]
+
+
+_indexes: dict[int, MenuIndex] = {}
+_lock = threading.Lock()
+
+
+def get_index(restaurant_id: int) -> MenuIndex:
+    version = db.get_menu_version(restaurant_id)
+    with _lock:
+        index = _indexes.setdefault(restaurant_id, MenuIndex(restaurant_id))
+        if index.version != version:
+            index.refresh(version)
+    return index
+
+
+def _format(items: list[dict], all_categories: list[str]) -> str:
+    by_cat: dict[str, list[dict]] = {}
+    for item in items:
+        by_cat.setdefault(item["category"] or "Other", []).append(item)
+    lines = []
+    for cat in sorted(by_cat):
+        lines.append(f"{cat}:")
+        lines.extend(f"- {i['name']}: Rs.{i['price_rs']}" for i in sorted(by_cat[cat], key=lambda i: i["name"]))
+    others = [c for c in all_categories if c not in by_cat]
+    if others:
+        lines.append(f"Also available (ask to see): {', '.join(others)}")
+    return "\n".join(lines)
+
+
+def relevant_menu_text(
+    restaurant_id: int, message: str, history: list[dict] | None = None, pinned_ids: list[int] | None = None
+) -> str:
+    """Menu text for the prompt: top-k items for the message (+ recent customer turns), grouped by category."""
+    index = get_index(restaurant_id)
+    if not index.items:
+        return "No menu items yet."
+    all_items = list(index.items.values())
+    msg_words = _words(message)
+    if len(all_items) <= MENU_FULL_MAX_ITEMS:
+        return _format(all_items, index.categories)
+    if FULL_MENU_WORDS & set(msg_words):
+        return _fallback(index)
+    weights = {}
+    recent = [h["content"] for h in (history or []) if h["role"] == "user"][-3:]
+    for turn in recent:
+        for w in _words(turn):
+            weights[w] = 0.5
+    for w in msg_words:
+        weights[w] = 1.0
+    ids = index.search(weights, MENU_TOP_K)
+    for item_id in pinned_ids or []:
+        if item_id in index.items and item_id not in ids:
+            ids.append(item_id)
+    if not ids:
+        return _fallback(index)
+    return _format([index.items[i] for i in ids], index.categories)
+
+
+def _fallback(index: MenuIndex) -> str:
+    if MENU_FALLBACK == "categories":
+        return (
+            "Categories: " + ", ".join(index.categories)
+            + "\n(Ask which category they want; matching items will be listed on the next message.)"
+        )
+    return _format(list(index.items.values()), index.categories)
@@ -0,0 +1,44 @@
+"""
+In-process counters and timings, served as Prometheus text on GET /metrics.
+"""
+import threading
+
+_lock = threading.Lock()
+_counters: dict[tuple, float] = {}
+_timings: dict[tuple, list] = {}  # key -> [count, sum, max]
+
+
+def _key(name: str, labels: dict) -> tuple:
+    return (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+
+
+def inc(name: str, amount: float = 1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(name: str, seconds: float, **labels):
+    """Record a duration; exported as <name>_count, <name>_sum and <name>_max."""
+    key = _key(name, labels)
+    with _lock:
+        t = _timings.setdefault(key, [0, 0.0, 0.0])
+        t[0] += 1
+        t[1] += seconds
+        t[2] = max(t[2], seconds)
+
+
+def _fmt(name: str, labels: tuple) -> str:
+    if not labels:
+        return name
+    return name + "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+def render() -> str:
+    with _lock:
+        lines = [f"{_fmt(n, l)} {v:g}" for (n, l), v in sorted(_counters.items())]
+        for (n, l), (count, total, peak) in sorted(_timings.items()):
+            lines.append(f"{_fmt(n + '_count', l)} {count}")
+            lines.append(f"{_fmt(n + '_sum', l)} {total:.6f}")
+            lines.append(f"{_fmt(n + '_max', l)} {peak:.6f}")
+    return "\n".join(lines) + "\n"
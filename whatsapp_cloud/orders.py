@@ -0,0 +1,164 @@
+"""
+Cart/order state: rule-based extraction of items and quantities from customer messages.
+Only items on the restaurant menu are accepted; prices always come from menu_items.
+"""
+import re
+
+import db
+
+NUMBER_WORDS = {
+    "ek": 1, "aik": 1, "one": 1, "do": 2, "two": 2, "teen": 3, "three": 3,
+    "char": 4, "chaar": 4, "four": 4, "panch": 5, "paanch": 5, "five": 5,
+    "che": 6, "chay": 6, "chhe": 6, "six": 6,
+}
+ADD_WORDS = {"add", "more", "extra", "another", "plus"}
+REMOVE_WORDS = {"remove", "hata", "hatao", "hatado", "cancel", "minus", "nikal", "nikalo"}
+NEGATIONS = ("nahi chahiye", "nai chahiye", "nahin chahiye", "mat bhejna", "don't want", "dont want")
+# "pepsi nahi", "no pepsi", "without pepsi", "pepsi mat dena" – remove, but only within their own clause
+NEGATION_WORDS = {"nahi", "nai", "nahin", "no", "without", "bina", "mat"}
+# Verbs that come before "do" in "de do", "kar do" – then "do" means "give", not 2
+VERBS_BEFORE_DO = {"de", "kar", "kr", "bhej", "la", "le", "rakh", "bana"}
+CLAUSE_SPLIT = re.compile(r"[,;.\n]|\b(?:aur|and|or|phir|then)\b")
+QUESTION_WORDS = {"kitne", "kitna", "kitni", "price", "rate", "kya"}
+# Words shared by too many items to identify one on their own
+GENERIC_WORDS = {"chicken", "beef", "special", "large", "small", "regular"}
+MAX_QTY = 50
+
+
+def _norm_token(t: str) -> str:
+    return t[:-1] if len(t) > 3 and t.endswith("s") else t
+
+
+def _tokens(text: str) -> list[str]:
+    return [_norm_token(t) for t in re.findall(r"[a-z0-9']+", text.lower())]
+
+
+def _aliases(menu: list[dict]) -> dict[tuple, int]:
+    """Map token tuples to menu_item_id: full names, menu_items.aliases and single words unique to one item.
+    Aliases shared by several items ("cold drink") are skipped – they don't say which one."""
+    aliases: dict[tuple, int] = {}
+    alias_owners: dict[tuple, set] = {}
+    word_owners: dict[str, set] = {}
+    for item in menu:
+        name = re.sub(r"\(.*?\)", "", item["name"])
+        toks = tuple(_tokens(name))
+        if toks:
+            aliases[toks] = item["id"]
+        for t in toks:
+            word_owners.setdefault(t, set()).add(item["id"])
+        for alias in (item.get("aliases") or "").split(","):
+            alias_toks = tuple(_tokens(alias))
+            if alias_toks:
+                alias_owners.setdefault(alias_toks, set()).add(item["id"])
+    for toks, owners in alias_owners.items():
+        if len(owners) == 1 and toks not in aliases:
+            aliases[toks] = next(iter(owners))
+    for word, owners in word_owners.items():
+        if len(owners) == 1 and len(word) >= 4 and word not in GENERIC_WORDS and (word,) not in aliases:
+            aliases[(word,)] = next(iter(owners))
+    return aliases
+
+
+def _qty_before(tokens: list[str], i: int) -> int | None:
+    """Quantity just before the item at i: '2 zinger', '2x zinger', 'do zinger', 'ek more zinger'."""
+    j = i - 1
+    if j >= 1 and tokens[j] in ADD_WORDS:
+        j -= 1
+    if j < 0:
+        return None
+    t = tokens[j]
+    m = re.fullmatch(r"(\d+)x?", t)
+    if m:
+        return int(m.group(1))
+    if t in NUMBER_WORDS and not (t == "do" and j > 0 and tokens[j - 1] in VERBS_BEFORE_DO):
+        return NUMBER_WORDS[t]
+    return None
+
+
+def extract_items(message: str, menu: list[dict]) -> list[tuple[int, int | None]]:
+    """Return [(menu_item_id, qty or None)] mentioned in the message, longest alias first."""
+    aliases = _aliases(menu)
+    max_len = max((len(k) for k in aliases), default=0)
+    tokens = _tokens(message)
+    found = []
+    i = 0
+    while i < len(tokens):
+        for n in range(min(max_len, len(tokens) - i), 0, -1):
+            item_id = aliases.get(tuple(tokens[i:i + n]))
+            if item_id is not None:
+                qty = _qty_before(tokens, i)
+                nxt = tokens[i + n] if i + n < len(tokens) else ""
+                if qty is None and re.fullmatch(r"x\d+", nxt):
+                    qty = int(nxt[1:])
+                found.append((item_id, qty))
+                i += n
+                break
+        else:
+            i += 1
+    return found
+
+
+def _clauses(message: str) -> list[str]:
+    """Split a message into item clauses so add/remove words only apply to their own items."""
+    text = message.lower()
+    # "coke instead of pepsi" / "pepsi ki jagah coke": the replaced item is removed, the other one set
+    text = re.sub(r"(.+?)\s+instead of\s+(.+)", r"\2 hata , \1", text)
+    text = re.sub(r"\s+(?:ki jagah|ke bajaye|ki bajaye)\s+", " hata , ", text)
+    # "pepsi hata ke coke" -> "pepsi hata , coke"
+    text = re.sub(r"\b(hata|hatao|nikal|nikalo|remove)\s+(?:ke|kar|kr)\b", r"\1 ,", text)
+    # "2 zinger no pepsi" / "zinger without pepsi": the negation starts its own clause
+    text = re.sub(r"\b(no|without|bina)\b", r", \1", text)
+    # "ek aur zinger" = one more zinger, not "one" and "zinger"
+    text = re.sub(r"\b(\d+|" + "|".join(NUMBER_WORDS) + r")\s+aur\b", r"\1 more", text)
+    return [c for c in CLAUSE_SPLIT.split(text) if c and c.strip()]
+
+
+def apply_message(current: dict[int, int], message: str, menu: list[dict]) -> dict[int, int] | None:
+    """New {menu_item_id: qty} after this customer message, or None if it doesn't touch the cart."""
+    clauses = [(c, extract_items(c, menu)) for c in _clauses(message)]
+    mentioned = [m for _, items in clauses for m in items]
+    if not mentioned:
+        return None
+    asking = "?" in message or bool(set(_tokens(message)) & QUESTION_WORDS)
+    if asking and all(q is None for _, q in mentioned) \
+            and not any(set(_tokens(c)) & REMOVE_WORDS for c, _ in clauses):
+        return None  # "zinger kitne ka hai?" is a question, not an order
+    cart = dict(current)
+    for clause, items in clauses:
+        words = set(_tokens(clause))
+        removing = bool(words & (REMOVE_WORDS | NEGATION_WORDS)) or any(n in clause for n in NEGATIONS)
+        adding = bool(words & ADD_WORDS)
+        for item_id, qty in items:
+            if removing:
+                cart.pop(item_id, None)
+            elif adding:
+                cart[item_id] = min(MAX_QTY, cart.get(item_id, 0) + (qty or 1))
+            else:
+                cart[item_id] = min(MAX_QTY, qty or cart.get(item_id) or 1)
+    return {k: v for k, v in cart.items() if v > 0}
+
+
+def cart_summary(order: dict | None) -> str:
+    """Compact cart line for the prompt, e.g. 'cart: 2x Zinger Burger Rs.700 | total Rs.700'."""
+    if not order or not order["items"]:
+        return "cart: empty"
+    parts = [f"{i['qty']}x {i['name']} Rs.{i['qty'] * i['unit_price_rs']}" for i in order["items"]]
+    return f"cart: {', '.join(parts)} | total Rs.{order['total_rs']}"
+
+
+def update_after_turn(conversation_id: int, restaurant_id: int, customer_message: str, bot_reply: str):
+    """Apply the customer's message to the open order; mark it confirmed when the bot confirms."""
+    order = db.get_open_order(conversation_id)
+    menu = db.get_menu_items(restaurant_id)
+    lowered = customer_message.lower()
+    if order and "order" in lowered and any(w in lowered for w in ("cancel", "nahi chahiye")) \
+            and not extract_items(customer_message, menu):
+        db.set_order_status(order["id"], "cancelled")
+        return
+    current = {i["menu_item_id"]: i["qty"] for i in order["items"]} if order else {}
+    new_cart = apply_message(current, customer_message, menu)
+    order_id = order["id"] if order else None
+    if new_cart is not None and new_cart != current:
+        order_id = db.set_order_items(conversation_id, restaurant_id, new_cart)
+    if order_id and "order confirm" in bot_reply.lower() and (new_cart or current):
+        db.set_order_status(order_id, "confirmed")
@@ -0,0 +1,31 @@
+"""
+Token bucket shared by outbound send pacing (sender.py) and inbound admission control (admission.py).
+"""
+import threading
+import time
+
+
+class TokenBucket:
+    """Simple token bucket. take() returns 0 if a token was taken, else seconds until one is free."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.capacity = max(burst, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self) -> float:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def refund(self):
+        """Give back a token taken for work that was rejected later."""
+        with self.lock:
+            self.tokens = min(self.capacity, self.tokens + 1)
@@ -0,0 +1,58 @@
+"""
+Hourly stats report from the stats_hourly rollup table (never scans messages),
+plus delivery latency / failure rate per number from message_statuses.
+Run: python report.py --restaurant 1 --hours 48
+     python report.py --backfill   (one-off: rebuild message/conversation counts from history)
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import db
+
+COLUMNS = [
+    ("hour", "hour (UTC)"), ("messages_in", "in"), ("messages_out", "out"), ("new_conversations", "new conv"),
+    ("llm_calls", "llm"), ("fast_path", "fast"), ("cache_hits", "cache"), ("replies_sent", "sent"),
+]
+
+
+def _print_delivery(since_ts: int):
+    rows = db.get_delivery_stats(since_ts)
+    if not rows:
+        return
+    print(f"{'phone_number_id':>18}  {'msgs':>6}  {'deliv':>6}  {'read':>6}  {'failed':>6}  {'fail %':>6}  {'deliv s':>7}")
+    for r in rows:
+        avg = "-" if r["avg_delivery_s"] is None else r["avg_delivery_s"]
+        print(f"{r['phone_number_id']:>18}  {r['messages']:>6}  {r['delivered']:>6}  {r['read']:>6}  "
+              f"{r['failed']:>6}  {r['failure_rate'] * 100:>6.1f}  {avg:>7}")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show hourly bot stats from rollup tables.")
+    parser.add_argument("--restaurant", type=int, help="restaurant id (default: all)")
+    parser.add_argument("--hours", type=int, default=24, help="how far back (default 24)")
+    parser.add_argument("--backfill", action="store_true", help="rebuild counts from raw history first")
+    args = parser.parse_args()
+
+    db.init_db()
+    if args.backfill:
+        db.backfill_hourly_stats()
+    since = time.strftime("%Y-%m-%d %H:00", time.gmtime(time.time() - args.hours * 3600))
+    rows = db.get_hourly_stats(args.restaurant, since)
+    _print_delivery(int(time.time()) - args.hours * 3600)
+    if not rows:
+        print("No stats since", since)
+        return
+    print(f"{'rest':>4}  " + "  ".join(f"{label:>16}" if key == "hour" else f"{label:>8}" for key, label in COLUMNS)
+          + f"  {'llm ms':>8}  {'reply ms':>8}")
+    for r in rows:
+        llm_avg = r["llm_ms_sum"] // r["llm_calls"] if r["llm_calls"] else 0
+        reply_avg = r["reply_ms_sum"] // r["replies_sent"] if r["replies_sent"] else 0
+        cells = "  ".join(f"{r[key]:>16}" if key == "hour" else f"{r[key]:>8}" for key, _ in COLUMNS)
+        print(f"{r['restaurant_id']:>4}  {cells}  {llm_avg:>8}  {reply_avg:>8}")
+
+
+if __name__ == "__main__":
+    main()
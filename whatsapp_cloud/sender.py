@@ -0,0 +1,249 @@
+"""
+Outbound WhatsApp sender: drains the outbox table in a background thread.
+Paces sends per phone_number_id with a token bucket, retries transient failures with backoff.
+Also sends read receipts / typing indicators off the reply path.
+"""
+import os
+import random
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import requests
+
+import analytics
+import db
+import metrics
+from ratelimit import TokenBucket
+
+log = logging.getLogger(__name__)
+
+WHATSAPP_TOKEN = os.getenv("WHATSAPP_ACCESS_TOKEN")
+GRAPH_API_VERSION = "v21.0"
+# Cloud API default throughput is 80 msg/s per number; stay well under it
+OUTBOX_SEND_RATE = float(os.getenv("OUTBOX_SEND_RATE", "20"))
+OUTBOX_SEND_BURST = float(os.getenv("OUTBOX_SEND_BURST", str(OUTBOX_SEND_RATE)))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "20"))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "1.0"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "6"))
+OUTBOX_MAX_BACKOFF = float(os.getenv("OUTBOX_MAX_BACKOFF", "300"))
+# Typing indicator shows for up to 25s on the customer's phone; renew a bit before it lapses
+TYPING_RENEW_SECONDS = float(os.getenv("TYPING_RENEW_SECONDS", "20"))
+TYPING_INDICATOR = os.getenv("TYPING_INDICATOR", "1").lower() in ("1", "true", "yes")
+# Graph error codes that mean "slow down", not "bad request"
+RETRYABLE_GRAPH_CODES = {4, 80007, 130429, 131048, 131056, 133016}
+
+
+def send_text(session: requests.Session, phone_number_id: str, to: str, text: str) -> tuple[bool, bool, str | None]:
+    """Send one text via Cloud API. Returns (ok, retryable, wa_message_id or error)."""
+    if not WHATSAPP_TOKEN:
+        return False, False, "WHATSAPP_ACCESS_TOKEN not set"
+    url = f"https://graph.facebook.com/{GRAPH_API_VERSION}/{phone_number_id}/messages"
+    headers = {"Authorization": f"Bearer {WHATSAPP_TOKEN}", "Content-Type": "application/json"}
+    body = {
+        "messaging_product": "whatsapp",
+        "recipient_type": "individual",
+        "to": to.lstrip("+"),
+        "type": "text",
+        "text": {"body": text},
+    }
+    try:
+        r = session.post(url, json=body, headers=headers, timeout=10)
+    except requests.RequestException as e:
+        return False, True, f"network: {e}"
+    if r.status_code < 400:
+        try:
+            wa_id = (r.json().get("messages") or [{}])[0].get("id")
+        except Exception:
+            wa_id = None
+        return True, False, wa_id
+    try:
+        code = (r.json().get("error") or {}).get("code")
+    except Exception:
+        code = None
+    retryable = r.status_code == 429 or r.status_code >= 500 or code in RETRYABLE_GRAPH_CODES
+    return False, retryable, f"HTTP {r.status_code}: {r.text[:300]}"
+
+
+def _backoff(attempts: int) -> float:
+    return min(OUTBOX_MAX_BACKOFF, 2 ** attempts) + random.uniform(0, 1)
+
+
+class OutboxSender:
+    """Background worker. Call start() once; notify() after enqueueing to skip the poll wait."""
+
+    def __init__(self):
+        self.session = requests.Session()
+        self.buckets: dict[str, TokenBucket] = {}
+        self.wake = threading.Event()
+        self.thread = None
+        # (outbox_id, wa_message_id, latency_ms) delivered but not yet saved as sent; row stays 'sending'
+        self.unrecorded: list[tuple[int, str | None, int]] = []
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        db.requeue_stuck_outbound()
+        self.thread = threading.Thread(target=self._run, name="outbox-sender", daemon=True)
+        self.thread.start()
+        log.info("Outbox sender started (%.0f msg/s per number)", OUTBOX_SEND_RATE)
+
+    def notify(self):
+        self.wake.set()
+
+    def _bucket(self, phone_number_id: str) -> TokenBucket:
+        if phone_number_id not in self.buckets:
+            self.buckets[phone_number_id] = TokenBucket(OUTBOX_SEND_RATE, OUTBOX_SEND_BURST)
+        return self.buckets[phone_number_id]
+
+    def _run(self):
+        while True:
+            if self._tick() < OUTBOX_BATCH_SIZE:
+                self.wake.wait(OUTBOX_POLL_SECONDS)
+                self.wake.clear()
+
+    def _tick(self) -> int:
+        """One pass: record earlier sends that failed to save, then deliver a batch. Never raises."""
+        self._retry_unrecorded()
+        try:
+            batch = db.claim_due_outbound(OUTBOX_BATCH_SIZE)
+        except Exception as e:
+            log.exception("Outbox claim failed: %s", e)
+            batch = []
+        for row in batch:
+            try:
+                self._deliver(row)
+            except Exception as e:
+                log.exception("Outbox row %s crashed: %s", row["id"], e)
+                attempts = row["attempts"] + 1
+                try:
+                    if attempts < OUTBOX_MAX_ATTEMPTS:
+                        db.reschedule_outbound(row["id"], _backoff(attempts), str(e)[:500])
+                    else:
+                        db.mark_outbound_failed(row["id"], f"crashed: {e}")
+                except Exception as e2:
+                    # Row stays 'sending'; requeue_stuck_outbound picks it up on the next start
+                    log.exception("Outbox row %s could not be rescheduled: %s", row["id"], e2)
+        return len(batch)
+
+    def _deliver(self, row: dict):
+        wait = self._bucket(row["phone_number_id"]).take()
+        if wait > 0:
+            # Over this number's rate: defer without burning an attempt, keep draining other numbers
+            db.reschedule_outbound(row["id"], wait, count_attempt=False)
+            return
+        ok, retryable, info = send_text(self.session, row["phone_number_id"], row["to_phone"], row["body"])
+        if ok:
+            self._record_sent(row, info)
+            return
+        attempts = row["attempts"] + 1
+        if retryable and attempts < OUTBOX_MAX_ATTEMPTS:
+            delay = _backoff(attempts)
+            log.warning("WhatsApp send retry %d/%d in %.0fs (outbox %s): %s",
+                        attempts, OUTBOX_MAX_ATTEMPTS, delay, row["id"], info)
+            db.reschedule_outbound(row["id"], delay, (info or "")[:500])
+        else:
+            log.error("WhatsApp send FAILED (outbox %s): %s", row["id"], info)
+            db.mark_outbound_failed(row["id"], info or "unknown error")
+
+    def _record_sent(self, row: dict, wa_message_id: str | None):
+        """Bookkeeping for a delivered row. Never raises: the message is out, it must not be sent again."""
+        latency_ms = int((time.time() - row["enqueued_at"]) * 1000)
+        try:
+            db.mark_outbound_sent(row["id"], wa_message_id, latency_ms)
+        except Exception as e:
+            log.exception("Outbox %s sent but not recorded, retrying the write: %s", row["id"], e)
+            self.unrecorded.append((row["id"], wa_message_id, latency_ms))
+        try:
+            metrics.observe("outbox_send_latency_seconds", latency_ms / 1000)
+            reply_ms = latency_ms
+            if row.get("accepted_at"):
+                metrics.observe("time_to_reply_seconds", time.time() - row["accepted_at"])
+                reply_ms = int((time.time() - row["accepted_at"]) * 1000)
+            analytics.rollup.record(row.get("restaurant_id"), replies_sent=1, reply_ms_sum=reply_ms)
+        except Exception as e:
+            log.exception("Outbox %s metrics failed: %s", row["id"], e)
+        log.info("WhatsApp send ok: outbox %s to %s in %d ms", row["id"], row["to_phone"], latency_ms)
+
+    def _retry_unrecorded(self):
+        pending, self.unrecorded = self.unrecorded, []
+        for n, (outbox_id, wa_message_id, latency_ms) in enumerate(pending):
+            try:
+                db.mark_outbound_sent(outbox_id, wa_message_id, latency_ms)
+            except Exception as e:
+                log.warning("Outbox %s still not recorded as sent: %s", outbox_id, e)
+                self.unrecorded.extend(pending[n:])
+                return
+
+
+outbox_sender = OutboxSender()
+
+
+def queue_message(
+    conversation_id: int | None, phone_number_id: str, to: str, text: str, accepted_at: float | None = None
+) -> int:
+    """Persist a reply to the outbox and wake the sender. accepted_at = when the inbound message arrived."""
+    outbox_id = db.enqueue_outbound(conversation_id, phone_number_id, to, text, accepted_at)
+    outbox_sender.notify()
+    return outbox_id
+
+
+# --- Read receipts + typing indicator (fire-and-forget, pooled HTTP sessions) ---
+
+_signal_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="wa-signal")
+_signal_local = threading.local()
+
+
+def _signal_session() -> requests.Session:
+    session = getattr(_signal_local, "session", None)
+    if session is None:
+        session = _signal_local.session = requests.Session()
+    return session
+
+
+def _post_signal(phone_number_id: str, message_id: str, accepted_at: float, first: bool):
+    body = {"messaging_product": "whatsapp", "status": "read", "message_id": message_id}
+    if TYPING_INDICATOR:
+        body["typing_indicator"] = {"type": "text"}
+    url = f"https://graph.facebook.com/{GRAPH_API_VERSION}/{phone_number_id}/messages"
+    headers = {"Authorization": f"Bearer {WHATSAPP_TOKEN}", "Content-Type": "application/json"}
+    try:
+        r = _signal_session().post(url, json=body, headers=headers, timeout=5)
+        if r.status_code >= 400:
+            log.warning("Read/typing signal %s: %s", r.status_code, r.text[:200])
+            metrics.inc("signal_total", outcome="error")
+            return
+    except requests.RequestException as e:
+        log.warning("Read/typing signal failed: %s", e)
+        metrics.inc("signal_total", outcome="error")
+        return
+    metrics.inc("signal_total", outcome="ok")
+    if first:
+        metrics.observe("time_to_first_signal_seconds", time.time() - accepted_at)
+
+
+def signal_read(phone_number_id: str, message_id: str | None, accepted_at: float, first: bool = True):
+    """Mark the inbound message read and show typing. Returns immediately."""
+    if not WHATSAPP_TOKEN or not message_id:
+        return
+    _signal_pool.submit(_post_signal, phone_number_id, message_id, accepted_at, first)
+
+
+@contextmanager
+def typing_while(phone_number_id: str, message_id: str | None, accepted_at: float):
+    """Send read + typing now and renew it every TYPING_RENEW_SECONDS until the block exits."""
+    signal_read(phone_number_id, message_id, accepted_at)
+    done = threading.Event()
+
+    def renew():
+        while not done.wait(TYPING_RENEW_SECONDS):
+            signal_read(phone_number_id, message_id, accepted_at, first=False)
+
+    if TYPING_INDICATOR and WHATSAPP_TOKEN and message_id:
+        threading.Thread(target=renew, name="wa-typing", daemon=True).start()
+    try:
+        yield
+    finally:
+        done.set()
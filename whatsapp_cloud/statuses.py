@@ -0,0 +1,133 @@
+"""
+Cloud API status callbacks (sent/delivered/read/failed). Status-only webhooks are acked on a fast
+path; statuses are merged in memory by outbound message id and batch-written to message_statuses.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+
+import db
+import metrics
+
+log = logging.getLogger(__name__)
+
+STATUS_FLUSH_SECONDS = float(os.getenv("STATUS_FLUSH_SECONDS", "5"))
+STATUS_FLUSH_MAX = 500
+# Rows kept for retry while the DB is failing; past this, the ones that failed to write are dropped
+STATUS_BUFFER_MAX = int(os.getenv("STATUS_BUFFER_MAX", "20000"))
+STATUS_FIELDS = {"sent": "sent_ts", "delivered": "delivered_ts", "read": "read_ts", "failed": "failed_ts"}
+
+
+def is_status_only(data: dict) -> bool:
+    """True when the payload carries statuses and no inbound messages – no message handling needed."""
+    has_status = False
+    for entry in data.get("entry", []):
+        for change in entry.get("changes", []):
+            value = change.get("value", {})
+            if value.get("messages"):
+                return False
+            has_status = has_status or bool(value.get("statuses"))
+    return has_status
+
+
+def parse_statuses(data: dict) -> list[dict]:
+    """Each item: {wa_message_id, phone_number_id, recipient, status, ts, error_code?, error_title?}."""
+    result = []
+    for entry in data.get("entry", []):
+        for change in entry.get("changes", []):
+            value = change.get("value", {})
+            phone_number_id = str(value.get("metadata", {}).get("phone_number_id", ""))
+            for st in value.get("statuses", []):
+                status = st.get("status")
+                if not st.get("id") or status not in STATUS_FIELDS:
+                    continue
+                try:
+                    ts = int(st.get("timestamp") or 0) or int(time.time())
+                except (TypeError, ValueError):
+                    ts = int(time.time())
+                error = (st.get("errors") or [{}])[0]
+                result.append({
+                    "wa_message_id": str(st["id"]),
+                    "phone_number_id": phone_number_id,
+                    "recipient": str(st.get("recipient_id", "")),
+                    "status": status,
+                    "ts": ts,
+                    "error_code": error.get("code"),
+                    "error_title": error.get("title") or error.get("message"),
+                })
+    return result
+
+
+class StatusBuffer:
+    """Merges statuses per wa_message_id and writes them with one executemany per flush."""
+
+    def __init__(self):
+        self.pending: dict[str, dict] = {}
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = None
+
+    def add(self, statuses: list[dict]):
+        with self.lock:
+            for st in statuses:
+                row = self.pending.setdefault(st["wa_message_id"], {
+                    "wa_message_id": st["wa_message_id"], "phone_number_id": st["phone_number_id"],
+                    "recipient": st["recipient"], "sent_ts": None, "delivered_ts": None, "read_ts": None,
+                    "failed_ts": None, "error_code": None, "error_title": None,
+                })
+                field = STATUS_FIELDS[st["status"]]
+                row[field] = min(filter(None, (row[field], st["ts"])))
+                if st["status"] == "failed":
+                    row["error_code"], row["error_title"] = st["error_code"], st["error_title"]
+                metrics.inc("status_callbacks_total", status=st["status"])
+            full = len(self.pending) >= STATUS_FLUSH_MAX
+        if full:
+            self.wake.set()
+
+    def flush(self):
+        with self.lock:
+            rows, self.pending = list(self.pending.values()), {}
+        if not rows:
+            return
+        try:
+            db.upsert_message_statuses(rows)
+        except Exception as e:
+            log.exception("Status flush failed, keeping %d rows for next try: %s", len(rows), e)
+            self._requeue(rows)
+
+    def _requeue(self, rows: list[dict]):
+        """Merge rows that failed to write back into pending; newer statuses for the same message win."""
+        dropped = 0
+        with self.lock:
+            for old in rows:
+                row = self.pending.get(old["wa_message_id"])
+                if row is None:
+                    if len(self.pending) >= STATUS_BUFFER_MAX:
+                        dropped += 1
+                        continue
+                    self.pending[old["wa_message_id"]] = old
+                    continue
+                for field in STATUS_FIELDS.values():
+                    row[field] = min(filter(None, (row[field], old[field])), default=None)
+                if row["error_code"] is None and row["error_title"] is None:
+                    row["error_code"], row["error_title"] = old["error_code"], old["error_title"]
+        if dropped:
+            log.error("Status buffer full (%d rows), dropped %d statuses", STATUS_BUFFER_MAX, dropped)
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.thread = threading.Thread(target=self._run, name="status-flush", daemon=True)
+        self.thread.start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self.wake.wait(STATUS_FLUSH_SECONDS)
+            self.wake.clear()
+            self.flush()
+
+
+status_buffer = StatusBuffer()
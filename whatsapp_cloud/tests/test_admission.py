@@ -0,0 +1,55 @@
+"""
+Admission control tests. Run from whatsapp_cloud/: python -m unittest discover tests
+"""
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import admission
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class AdmissionTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        for target, value in (
+            ("admission.time.monotonic", self.clock), ("ratelimit.time.monotonic", self.clock),
+            ("admission.ADMIT_CUSTOMER_PER_MIN", 6), ("admission.ADMIT_CUSTOMER_BURST", 2),
+            ("admission.ADMIT_RESTAURANT_PER_MIN", 6), ("admission.ADMIT_RESTAURANT_BURST", 2),
+            ("admission.ADMIT_OVERLIMIT", admission.REPLY), ("admission.ADMIT_REPLY_COOLDOWN", 60),
+        ):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.admission = admission.Admission()
+
+    def test_customer_over_limit_gets_one_reply_per_cooldown(self):
+        check = lambda: self.admission.check("923001111111", 1)
+        self.assertEqual([check(), check(), check(), check()],
+                         [admission.ADMIT, admission.ADMIT, admission.REPLY, admission.DROP])
+        self.clock.now += 30
+        # 30s at 6/min refilled the bucket, but the next over-limit notice waits for the cooldown
+        self.assertEqual([check(), check(), check()], [admission.ADMIT, admission.ADMIT, admission.DROP])
+        self.clock.now += 30
+        check(), check()
+        self.assertEqual(check(), admission.REPLY)
+
+    def test_restaurant_rejection_refunds_customer_token(self):
+        self.assertEqual(self.admission.check("923001111111", 1), admission.ADMIT)
+        self.assertEqual(self.admission.check("923002222222", 1), admission.ADMIT)
+        # Restaurant bucket is empty; the third customer keeps both of their own tokens
+        self.assertEqual(self.admission.check("923003333333", 1), admission.REPLY)
+        self.assertEqual(self.admission.check("923003333333", 1), admission.DROP)
+        self.assertEqual(self.admission.customers["923003333333"].tokens, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
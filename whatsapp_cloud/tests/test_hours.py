@@ -0,0 +1,133 @@
+"""
+Opening-hours parser and schedule tests. Run from whatsapp_cloud/: python -m unittest discover tests
+"""
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import app
+import db
+import hours
+
+
+def pkt(day: int, hour: int, minute: int = 0) -> datetime:
+    """October 2026 in Karachi time; the 19th is a Monday."""
+    return datetime(2026, 10, day, hour, minute, tzinfo=hours.KARACHI)
+
+
+class ParseTest(unittest.TestCase):
+    def test_daily_range(self):
+        s = hours.parse_schedule("12pm-11pm")
+        self.assertTrue(s.is_open(pkt(19, 12)))
+        self.assertTrue(s.is_open(pkt(19, 22, 59)))
+        self.assertFalse(s.is_open(pkt(19, 23)))
+        self.assertFalse(s.is_open(pkt(19, 11, 59)))
+
+    def test_noon_and_midnight(self):
+        s = hours.parse_schedule("noon-11pm")
+        self.assertTrue(s.is_open(pkt(19, 12)))
+        self.assertFalse(s.is_open(pkt(19, 11)))
+        s = hours.parse_schedule("mon-sun noon-midnight")
+        self.assertTrue(s.is_open(pkt(19, 23, 59)))
+        self.assertFalse(s.is_open(pkt(20, 0)))
+
+    def test_later_rule_overrides_day(self):
+        s = hours.parse_schedule("daily 12pm-11pm; tue closed")
+        self.assertTrue(s.is_open(pkt(19, 13)))
+        self.assertFalse(s.is_open(pkt(20, 13)))
+
+    def test_invalid_input(self):
+        for text in ("25:00-11pm", "13pm-11pm", "12pm", "funday 12pm-11pm", "blah", "closed", "daily closed"):
+            with self.subTest(text=text):
+                with self.assertRaises(ValueError):
+                    hours.parse_schedule(text)
+
+    def test_bad_holiday_date(self):
+        with self.assertRaises(ValueError):
+            hours.parse_schedule("12pm-11pm", "2026-13-01 closed")
+
+
+class OvernightTest(unittest.TestCase):
+    def setUp(self):
+        self.s = hours.parse_schedule("mon-thu 12pm-11pm; fri 2pm-2am")
+
+    def test_open_after_midnight_from_previous_day(self):
+        # Friday 2pm-2am is still open at 1:30 on Saturday, which has no hours of its own
+        self.assertTrue(self.s.is_open(pkt(24, 1, 30)))
+        self.assertFalse(self.s.is_open(pkt(24, 2)))
+
+    def test_no_spill_from_day_without_overnight(self):
+        self.assertFalse(self.s.is_open(pkt(20, 0, 30)))
+
+
+class HolidayTest(unittest.TestCase):
+    def test_closed_holiday(self):
+        s = hours.parse_schedule("12pm-11pm", "2026-10-20 closed")
+        self.assertFalse(s.is_open(pkt(20, 13)))
+        self.assertTrue(s.is_open(pkt(21, 13)))
+
+    def test_special_hours(self):
+        s = hours.parse_schedule("12pm-11pm", "2026-10-20 4pm-11pm")
+        self.assertFalse(s.is_open(pkt(20, 13)))
+        self.assertTrue(s.is_open(pkt(20, 16)))
+
+
+class NextOpeningTest(unittest.TestCase):
+    def test_later_today(self):
+        s = hours.parse_schedule("12pm-11pm")
+        self.assertEqual(s.next_opening(pkt(19, 9)), pkt(19, 12))
+        self.assertIn("aaj 12:00 PM", hours.closed_reply(s, pkt(19, 9), "Moon Kitchen"))
+
+    def test_tomorrow(self):
+        s = hours.parse_schedule("12pm-11pm")
+        self.assertEqual(s.next_opening(pkt(19, 23, 30)), pkt(20, 12))
+        self.assertIn("kal 12:00 PM", hours.closed_reply(s, pkt(19, 23, 30), "Moon Kitchen"))
+
+    def test_skips_closed_days_and_holidays(self):
+        s = hours.parse_schedule("daily 12pm-11pm; tue,wed closed", "2026-10-22 closed")
+        self.assertEqual(s.next_opening(pkt(19, 23, 30)), pkt(23, 12))
+        self.assertIn("Friday 12:00 PM", hours.closed_reply(s, pkt(19, 23, 30), "Moon Kitchen"))
+
+
+class RestaurantHoursTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        db.DB_FILE = Path(self.tmp.name) / "test.db"
+        db.init_db()
+        hours._cache.clear()
+
+    def tearDown(self):
+        hours._cache.clear()
+        self.tmp.cleanup()
+
+    def test_restaurant_hours_override_default(self):
+        db.set_restaurant_hours(1, "fri 2pm-2am")
+        self.assertEqual(hours.hours_text(1, "12pm-11pm"), "fri 2pm-2am")
+        self.assertFalse(hours.get_schedule(1, "12pm-11pm").is_open(pkt(19, 13)))
+
+    def test_unparseable_hours_are_not_enforced(self):
+        db.set_restaurant_hours(1, "closed")
+        with mock.patch("hours.log"):
+            self.assertIsNone(hours.get_schedule(1))
+        self.assertEqual(hours.hours_text(1), "closed")
+
+    def test_prompt_explains_hours_only_when_not_enforced(self):
+        conv_id = db.get_or_create_conversation(1, "923000000000")
+        instruction = "say we're closed and when we open"
+        db.set_restaurant_hours(1, "12pm to 11pm")
+        with mock.patch("hours.log"):
+            system, _ = app.build_prompt(conv_id, "salam", 1)
+        self.assertIn("We're open 12pm to 11pm", system)
+        self.assertIn(instruction, system)
+        hours._cache.clear()
+        db.set_restaurant_hours(1, "12pm-11pm")
+        system, _ = app.build_prompt(conv_id, "salam", 1)
+        self.assertIn("We're open 12pm-11pm", system)
+        self.assertNotIn(instruction, system)
+
+
+if __name__ == "__main__":
+    unittest.main()
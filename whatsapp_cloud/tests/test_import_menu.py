@@ -0,0 +1,79 @@
+"""
+Menu import and built-in seed tests. Run from whatsapp_cloud/: python -m unittest discover tests
+"""
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import db
+import import_menu
+
+
+class ImportTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        db.DB_FILE = self.dir / "test.db"
+        db.init_db()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_import(self, name: str, content: str, *flags: str):
+        path = self.dir / name
+        path.write_text(content, encoding="utf-8")
+        with mock.patch.object(sys, "argv", ["import_menu.py", str(path), *flags]), \
+                mock.patch("builtins.print"):
+            import_menu.main()
+
+    def names(self) -> set[str]:
+        return {i["name"] for i in db.get_menu_items(1)}
+
+
+class ImportMenuTest(ImportTestCase):
+    def test_truncated_json_is_refused_even_with_allow_empty(self):
+        before = self.names()
+        with self.assertRaises(SystemExit):
+            self.run_import("bad.json", '[{"name": "Tea", "price_rs": 8', "--allow-empty")
+        self.assertEqual(self.names(), before)
+
+    def test_missing_column_is_refused_even_with_keep_missing(self):
+        with self.assertRaises(SystemExit):
+            self.run_import("bad.csv", "item,cost\nTea,80\n", "--keep-missing")
+
+    def test_item_without_name_is_refused(self):
+        with self.assertRaises(SystemExit):
+            self.run_import("menu.json", '[{"price_rs": 80}]')
+
+    def test_empty_menu_needs_allow_empty(self):
+        with self.assertRaises(SystemExit):
+            self.run_import("empty.json", "[]")
+        self.assertTrue(self.names())
+        self.run_import("empty.json", "[]", "--allow-empty")
+        self.assertEqual(self.names(), set())
+
+    def test_csv_import(self):
+        self.run_import("menu.csv", "name,price\nTea,80\nSamosa,40\n")
+        self.assertEqual(self.names(), {"Tea", "Samosa"})
+
+
+class SeedTest(ImportTestCase):
+    def changed_seed(self):
+        return mock.patch("db.DEFAULT_MENU", db.DEFAULT_MENU + [("Kulfi", 120, "Desserts", "")])
+
+    def test_seed_change_does_not_overwrite_import(self):
+        self.run_import("menu.csv", "name,price\nTea,80\n")
+        with self.changed_seed():
+            db.init_db()
+        self.assertEqual(self.names(), {"Tea"})
+
+    def test_seed_change_updates_untouched_menu(self):
+        with self.changed_seed():
+            db.init_db()
+        self.assertIn("Kulfi", self.names())
+
+
+if __name__ == "__main__":
+    unittest.main()
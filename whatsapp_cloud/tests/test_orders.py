@@ -0,0 +1,108 @@
+"""
+Cart extraction regression tests. Run from whatsapp_cloud/: python -m unittest discover tests
+"""
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import db
+import orders
+
+
+class OrdersTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        db.DB_FILE = Path(self.tmp.name) / "test.db"
+        db.init_db()
+        self.menu = db.get_menu_items(1)
+        self.ids = {i["name"]: i["id"] for i in self.menu}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def cart(self, **named):
+        return {self.ids[name.replace("_", " ")]: qty for name, qty in named.items()}
+
+    def apply(self, current, message):
+        return orders.apply_message(current, message, self.menu)
+
+
+class ApplyMessageTest(OrdersTestCase):
+    def test_remove_applies_only_to_its_clause(self):
+        self.assertEqual(self.apply(self.cart(Pepsi=1), "pepsi hata do, coke kar do"), self.cart(Coke=1))
+
+    def test_remove_then_replace_without_comma(self):
+        self.assertEqual(self.apply(self.cart(Pepsi=1), "pepsi hata ke coke de do"), self.cart(Coke=1))
+
+    def test_verb_do_is_not_two(self):
+        self.assertEqual(self.apply({}, "ek zinger de do, pepsi bhi"), self.cart(Zinger_Burger=1, Pepsi=1))
+        self.assertEqual(self.apply({}, "zinger de do pepsi bhi"), self.cart(Zinger_Burger=1, Pepsi=1))
+
+    def test_do_before_item_is_two(self):
+        self.assertEqual(self.apply({}, "do zinger chahiye"), self.cart(Zinger_Burger=2))
+
+    def test_restated_order_is_not_added_twice(self):
+        current = self.cart(Zinger_Burger=2, Pepsi=1)
+        self.assertEqual(self.apply(current, "theek hai 2 zinger aur 1 pepsi"), current)
+
+    def test_ki_jagah_replaces(self):
+        self.assertEqual(self.apply(self.cart(Pepsi=1), "pepsi ki jagah coke"), self.cart(Coke=1))
+
+    def test_instead_of_replaces(self):
+        self.assertEqual(self.apply(self.cart(Pepsi=1), "coke instead of pepsi"), self.cart(Coke=1))
+
+    def test_ek_aur_adds_one_more(self):
+        self.assertEqual(self.apply(self.cart(Zinger_Burger=2), "ek aur zinger"), self.cart(Zinger_Burger=3))
+
+    def test_negations_remove(self):
+        current = self.cart(Pepsi=1, Zinger_Burger=2)
+        for message in ("pepsi nahi", "no pepsi", "without pepsi", "pepsi mat dena", "2 zinger, pepsi nahi chahiye"):
+            with self.subTest(message=message):
+                self.assertEqual(self.apply(current, message), self.cart(Zinger_Burger=2))
+
+    def test_negation_stays_in_its_clause(self):
+        self.assertEqual(self.apply({}, "2 zinger no pepsi"), self.cart(Zinger_Burger=2))
+        self.assertEqual(self.apply({}, "zinger burger without pepsi"), self.cart(Zinger_Burger=1))
+
+    def test_menu_aliases(self):
+        self.assertEqual(self.apply({}, "2 tea"), self.cart(Chai=2))
+        self.assertEqual(self.apply({}, "ek coca cola aur chips"), self.cart(Coke=1, French_Fries=1))
+
+    def test_shared_alias_is_ambiguous(self):
+        self.assertIsNone(self.apply({}, "ek cold drink"))
+
+    def test_price_question_leaves_cart(self):
+        self.assertIsNone(self.apply(self.cart(Pepsi=1), "zinger kitne ka hai?"))
+
+    def test_unrelated_message(self):
+        self.assertIsNone(self.apply(self.cart(Pepsi=1), "bhai kya scene hai"))
+
+
+class CorpusFlowTest(OrdersTestCase):
+    def replay(self, name):
+        corpus = json.loads((Path(__file__).resolve().parent.parent / "bench_corpus.json").read_text("utf-8"))
+        turns = next(c for c in corpus if c["name"] == name)["turns"]
+        conv_id = db.get_or_create_conversation(1, "923000000000")
+        for user_msg, bot_reply in turns:
+            orders.update_after_turn(conv_id, 1, user_msg, bot_reply)
+        return db.list_orders(1)
+
+    def test_order_flow_confirms_expected_cart(self):
+        (order,) = self.replay("order_flow")
+        self.assertEqual(order["status"], "confirmed")
+        self.assertEqual(
+            {i["name"]: i["qty"] for i in order["items"]},
+            {"Zinger Burger": 2, "French Fries": 1, "Coke": 1},
+        )
+        self.assertEqual(order["total_rs"], 2 * 350 + 120 + 80)
+
+    def test_misspelled_flow_never_invents_items(self):
+        (order,) = self.replay("misspelled_roman_urdu")
+        self.assertEqual(order["status"], "open")
+        self.assertEqual({i["name"]: i["qty"] for i in order["items"]}, {"Lassi": 2})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+"""
+Outbox sender tests. Run from whatsapp_cloud/: python -m unittest discover tests
+"""
+import sqlite3
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import db
+import sender
+
+
+class OutboxTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        db.DB_FILE = Path(self.tmp.name) / "test.db"
+        db.init_db()
+        self.sends = []
+        patcher = mock.patch("sender.send_text", side_effect=self.fake_send)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        log = mock.patch("sender.log")
+        log.start()
+        self.addCleanup(log.stop)
+        self.sender = sender.OutboxSender()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def fake_send(self, session, phone_number_id, to, text):
+        self.sends.append(text)
+        return True, False, f"wamid.{len(self.sends)}"
+
+    def status(self, outbox_id: int) -> str:
+        with db.get_conn() as conn:
+            return conn.execute("SELECT status FROM outbox WHERE id = ?", (outbox_id,)).fetchone()["status"]
+
+
+class RecordSentTest(OutboxTestCase):
+    def test_failed_sent_write_is_retried_without_resending(self):
+        outbox_id = db.enqueue_outbound(None, "1", "923001234567", "hello")
+        with mock.patch("sender.db.mark_outbound_sent", side_effect=sqlite3.OperationalError("database is locked")):
+            self.sender._tick()
+            self.sender._tick()
+        self.assertEqual(self.status(outbox_id), "sending")
+        self.sender._tick()
+        self.assertEqual(self.sends, ["hello"])
+        self.assertEqual(self.status(outbox_id), "sent")
+        self.assertEqual(self.sender.unrecorded, [])
+
+
+class CrashTest(OutboxTestCase):
+    def test_loop_survives_failing_error_path(self):
+        db.enqueue_outbound(None, "1", "923001234567", "hello")
+        with mock.patch.object(self.sender, "_deliver", side_effect=RuntimeError("boom")), \
+                mock.patch("sender.db.reschedule_outbound", side_effect=sqlite3.OperationalError("locked")):
+            self.assertEqual(self.sender._tick(), 1)
+
+    def test_crash_on_last_attempt_marks_failed(self):
+        outbox_id = db.enqueue_outbound(None, "1", "923001234567", "hello")
+        with db.get_conn() as conn:
+            conn.execute("UPDATE outbox SET attempts = ? WHERE id = ?", (sender.OUTBOX_MAX_ATTEMPTS - 1, outbox_id))
+        with mock.patch.object(self.sender, "_deliver", side_effect=RuntimeError("boom")):
+            self.sender._tick()
+        self.assertEqual(self.status(outbox_id), "failed")
+
+
+if __name__ == "__main__":
+    unittest.main()
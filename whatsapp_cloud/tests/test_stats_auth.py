@@ -0,0 +1,44 @@
+"""
+Reporting route auth tests. Run from whatsapp_cloud/: python -m unittest discover tests
+"""
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import app
+import db
+
+ROUTES = ("/metrics", "/stats", "/stats/delivery")
+
+
+class StatsAuthTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        db.DB_FILE = Path(self.tmp.name) / "test.db"
+        db.init_db()
+        self.client = app.app.test_client()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def get(self, route: str, token: str | None = None) -> int:
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        return self.client.get(route, headers=headers).status_code
+
+    def test_disabled_without_token_configured(self):
+        with mock.patch("app.STATS_TOKEN", ""):
+            for route in ROUTES:
+                self.assertEqual(self.get(route, "anything"), 404, route)
+
+    def test_requires_matching_token(self):
+        with mock.patch("app.STATS_TOKEN", "s3cret"):
+            for route in ROUTES:
+                self.assertEqual(self.get(route), 401, route)
+                self.assertEqual(self.get(route, "wrong"), 401, route)
+                self.assertEqual(self.get(route, "s3cret"), 200, route)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+"""
+Status buffer tests. Run from whatsapp_cloud/: python -m unittest discover tests
+"""
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import statuses
+
+
+def status(wa_id: str, name: str, ts: int) -> dict:
+    return {"wa_message_id": wa_id, "phone_number_id": "1", "recipient": "923001234567",
+            "status": name, "ts": ts, "error_code": None, "error_title": None}
+
+
+@mock.patch("statuses.db.upsert_message_statuses", side_effect=RuntimeError("database is locked"))
+@mock.patch("statuses.log")
+class FlushFailureTest(unittest.TestCase):
+    def test_rows_kept_and_merged_with_newer_statuses(self, _log, _upsert):
+        buffer = statuses.StatusBuffer()
+        buffer.add([status("a", "sent", 10)])
+        buffer.flush()
+        buffer.add([status("a", "read", 30), status("a", "sent", 12)])
+        row = buffer.pending["a"]
+        self.assertEqual((row["sent_ts"], row["read_ts"]), (10, 30))
+
+    def test_requeue_is_capped(self, _log, _upsert):
+        buffer = statuses.StatusBuffer()
+        buffer.add([status("a", "sent", 10), status("b", "sent", 10)])
+        with mock.patch("statuses.STATUS_BUFFER_MAX", 1):
+            buffer.flush()
+        self.assertEqual(len(buffer.pending), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()